@@ -332,13 +332,15 @@ export class CdkStack extends cdk.Stack {
     // Create AI Inference Lambda (Python) - TensorFlow Multi-Task Marketplace Health Model
     const aiLambda = new lambda.Function(this, 'AIFunction', {
       runtime: lambda.Runtime.PYTHON_3_12,
+      // Graviton: better price/performance for the NumPy/Numba feature pipeline
+      architecture: lambda.Architecture.ARM_64,
       handler: 'handler.lambda_handler',
       code: lambda.Code.fromAsset(path.join(__dirname, '../../lambda/ai-analysis'), {
         bundling: {
           image: lambda.Runtime.PYTHON_3_12.bundlingImage,
           command: [
             'bash', '-c',
-            'pip install -r requirements.txt -t /asset-output --platform manylinux2014_x86_64 --only-binary=:all: --python-version 3.12 && cp handler.py /asset-output/'
+            'pip install -r requirements.txt -t /asset-output --platform manylinux2014_aarch64 --only-binary=:all: --python-version 3.12 && cp handler.py /asset-output/'
           ],
         },
       }),
@@ -346,9 +348,15 @@ export class CdkStack extends cdk.Stack {
       environment: {
         DYNAMODB_TABLE_NAME: this.metricsTable.tableName,
         SAGEMAKER_ENDPOINT_NAME: 'marketplace-health-endpoint',
+        SAGEMAKER_CONTENT_TYPE: 'application/json',
+        SAGEMAKER_MAX_BATCH_SIZE: '100',
+        SAGEMAKER_ACCEPT: 'application/json',
         MODEL_VERSION: 'marketplace-health-v1',
         MODEL_TYPE: 'tensorflow_multi_task',
         BATCH_SIZE: '100',
+        ENTITY_WORKERS: '16',
+        PREDICTION_MAX_AGE_SECONDS: '3600',
+        PREDICTION_CACHE_SIZE: '10000',
         EVENT_BUS_NAME: this.eventBus.eventBusName,
         DEPLOYMENT_TIMESTAMP: '2025-11-08T05:30:00Z',
       },
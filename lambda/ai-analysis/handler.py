@@ -1,310 +1,480 @@
+import hashlib
 import json
 import os
+import random
+import threading
+import time
+import uuid
 import boto3
 import numpy as np
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain, repeat
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
-from decimal import Decimal
-from typing import Dict, List, Any, Optional
-
-# Initialize AWS clients
-sagemaker_runtime = boto3.client('sagemaker-runtime', region_name='us-east-2')
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-2'))
-cloudwatch = boto3.client('cloudwatch', region_name=os.environ.get('AWS_REGION', 'us-east-2'))
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Without Numba the feature kernels are swapped for their NumPy array versions (e.g. local tooling)
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library codec when orjson is not installed (e.g. local tooling)
+    orjson = None
+
+# Entity updates run on a thread pool, so size the HTTP connection pools to match.
+# Keep-alive holds pooled sockets open between pages; adaptive retries back off
+# client-side when the endpoint or table throttles.
+ENTITY_WORKERS = int(os.environ.get('ENTITY_WORKERS', '16'))
+client_config = Config(
+    max_pool_connections=max(64, 2 * ENTITY_WORKERS),
+    retries={'mode': 'adaptive', 'max_attempts': 3},
+    tcp_keepalive=True
+)
+
+# Initialize AWS clients from one session so they share its credential
+# resolution and loaded service models
+aws_session = boto3.session.Session(region_name=os.environ.get('AWS_REGION', 'us-east-2'))
+sagemaker_runtime = aws_session.client('sagemaker-runtime', region_name='us-east-2', config=client_config)
+dynamodb = aws_session.resource('dynamodb', config=client_config)
+# Low-level client for all writes with explicit attribute types; it is the resource's own
+# client, so reads (table.query/get_item) and writes share one connection pool
+dynamodb_client = dynamodb.meta.client
+cloudwatch = aws_session.client('cloudwatch', config=client_config)
+
+# Worker pool for page prefetches and per-entity updates, kept for the container's
+# lifetime so warm invocations reuse its threads
+entity_executor = ThreadPoolExecutor(max_workers=ENTITY_WORKERS)
+# Students and tutors are processed side by side; separate from entity_executor so the
+# two runs never wait on their own page and update tasks queued behind them
+entity_type_executor = ThreadPoolExecutor(max_workers=2)
 
 # Configuration
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
 ENDPOINT_NAME = os.environ.get('SAGEMAKER_ENDPOINT_NAME', 'marketplace-health-endpoint')
 MODEL_VERSION = os.environ.get('MODEL_VERSION', 'marketplace-health-v1')
 BATCH_SIZE = int(os.environ.get('BATCH_SIZE', '100'))
+# Request encoding for the endpoint: 'application/json' (TF Serving instances) or 'text/csv'
+SAGEMAKER_CONTENT_TYPE = os.environ.get('SAGEMAKER_CONTENT_TYPE', 'application/json')
+# Largest batch the endpoint accepts per request (TF Serving max_batch_size); bigger pages are split
+SAGEMAKER_MAX_BATCH_SIZE = int(os.environ.get('SAGEMAKER_MAX_BATCH_SIZE', '100'))
+# Response format: 'application/json', or 'application/octet-stream' for the packed float32
+# (N, 5) tensor produced by the model's inference.py output handler
+SAGEMAKER_ACCEPT = os.environ.get('SAGEMAKER_ACCEPT', 'application/json')
+FEATURE_COUNT = 46
+# CSV row template; 9 significant digits round-trip every float32 exactly
+CSV_ROW_FORMAT = b','.join([b'%.9g'] * FEATURE_COUNT)
+
+# DynamoDB BatchWriteItem limits and retry policy for unprocessed items
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_RETRIES = 5
+BATCH_WRITE_BASE_BACKOFF_S = 0.05
+
+# Entities whose features hash to the stored feature_hash reuse their stored predictions
+# until they are this old (seconds); 0 re-scores every entity on every run
+PREDICTION_MAX_AGE_SECONDS = int(os.environ.get('PREDICTION_MAX_AGE_SECONDS', '3600'))
+# Feature hashes scored by this container that are kept in memory (LRU), so identical
+# feature vectors (e.g. dormant entities) are scored once; 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '10000'))
+
+# Open client connections during init (free under SnapStart, off the first request's clock)
+WARM_CONNECTIONS = os.environ.get('WARM_CONNECTIONS', 'true').lower() == 'true'
 
 table = dynamodb.Table(TABLE_NAME)
 
-def engineer_tutor_features(metrics: Dict[str, Any]) -> np.ndarray:
-    """
-    Engineer 46 tutor-specific features for SageMaker endpoint
-
-    Feature Groups:
-    - Session Performance (13): taught counts, completion rates, gaps
-    - Student Satisfaction (8): ratings, reviews, retention
-    - Availability & Capacity (6): hours, utilization, response time
-    - Subject Expertise (10): diversity, certifications, match accuracy
-    - Financial & Business (9): earnings, pricing, revenue
-    """
-    features = []
-
-    # Session Performance (13 features)
-    sessions_taught_7d = float(metrics.get('sessions_taught_7d', 0))
-    sessions_taught_14d = float(metrics.get('sessions_taught_14d', 0))
-    sessions_taught_30d = float(metrics.get('sessions_taught_30d', 0))
-    sessions_completed_7d = float(metrics.get('sessions_completed_7d', 0))
-    sessions_completed_14d = float(metrics.get('sessions_completed_14d', 0))
-    sessions_completed_30d = float(metrics.get('sessions_completed_30d', 0))
-    avg_session_duration_min = float(metrics.get('avg_session_duration_min', 60))
-    session_completion_rate = float(metrics.get('session_completion_rate', 0.95))
-    no_show_rate = float(metrics.get('no_show_rate', 0))
-    cancellation_rate = float(metrics.get('cancellation_rate', 0))
-    days_since_last_session = float(metrics.get('days_since_last_session', 7))
-    session_frequency_7d = sessions_taught_7d / 7.0
-    session_frequency_14d = sessions_taught_14d / 14.0
-    features.extend([
-        sessions_taught_7d, sessions_taught_14d, sessions_taught_30d,
-        sessions_completed_7d, sessions_completed_14d, sessions_completed_30d,
-        avg_session_duration_min, session_completion_rate,
-        no_show_rate, cancellation_rate, days_since_last_session,
-        session_frequency_7d, session_frequency_14d
-    ])
-
-    # Student Satisfaction (8 features)
-    avg_rating = float(metrics.get('avg_rating', 4.5))
-    rating_trend = float(metrics.get('rating_trend', 0))
-    rating_volatility = float(metrics.get('rating_volatility', 0))
-    positive_reviews_30d = float(metrics.get('positive_reviews_count_30d', 0))
-    negative_reviews_30d = float(metrics.get('negative_reviews_count_30d', 0))
-    student_retention_rate = float(metrics.get('student_retention_rate', 0.7))
-    unique_students_30d = float(metrics.get('unique_students_30d', 10))
-    avg_student_lifetime_sessions = float(metrics.get('avg_student_lifetime_sessions', 5))
-    features.extend([
-        avg_rating, rating_trend, rating_volatility,
-        positive_reviews_30d, negative_reviews_30d, student_retention_rate,
-        unique_students_30d, avg_student_lifetime_sessions
-    ])
-
-    # Availability & Capacity (6 features)
-    available_hours_this_week = float(metrics.get('available_hours_this_week', 20))
-    available_hours_next_week = float(metrics.get('available_hours_next_week', 20))
-    utilization_rate = float(metrics.get('utilization_rate', 0.6))
-    instant_book_enabled = float(metrics.get('instant_book_enabled', 1))
-    avg_response_time_hours = float(metrics.get('avg_response_time_hours', 2))
-    booking_lead_time_avg_hours = float(metrics.get('booking_lead_time_avg_hours', 48))
-    features.extend([
-        available_hours_this_week, available_hours_next_week, utilization_rate,
-        instant_book_enabled, avg_response_time_hours, booking_lead_time_avg_hours
-    ])
-
-    # Subject Expertise (10 features)
-    primary_subject_count = float(metrics.get('primary_subject_count', 1))
-    subject_diversity_score = float(metrics.get('subject_diversity_score', 0.5))
-    avg_rating_by_subject = float(metrics.get('avg_rating_by_subject', 4.5))
-    sessions_per_subject_30d = float(metrics.get('sessions_per_subject_30d', 10))
-    subject_match_accuracy = float(metrics.get('subject_match_accuracy', 0.8))
-    certification_count = float(metrics.get('certification_count', 2))
-    years_of_experience = float(metrics.get('years_of_experience', 3))
-    specialization_score = float(metrics.get('specialization_score', 0.7))
-    advanced_topics_count = float(metrics.get('advanced_topics_count', 1))
-    student_grade_improvement_avg = float(metrics.get('student_grade_improvement_avg', 10))
-    features.extend([
-        primary_subject_count, subject_diversity_score, avg_rating_by_subject,
-        sessions_per_subject_30d, subject_match_accuracy, certification_count,
-        years_of_experience, specialization_score, advanced_topics_count,
-        student_grade_improvement_avg
-    ])
-
-    # Financial & Business (9 features)
-    total_earnings_30d = float(metrics.get('total_earnings_30d', 1000))
-    avg_earnings_per_session = float(metrics.get('avg_earnings_per_session', 50))
-    earnings_trend = float(metrics.get('earnings_trend', 0))
-    premium_tier_sessions_ratio = float(metrics.get('premium_tier_sessions_ratio', 0.3))
-    discount_sessions_ratio = float(metrics.get('discount_sessions_ratio', 0.1))
-    payment_disputes_30d = float(metrics.get('payment_disputes_count_30d', 0))
-    refund_rate_30d = float(metrics.get('refund_rate_30d', 0))
-    pricing_competitiveness_score = float(metrics.get('pricing_competitiveness_score', 0.75))
-    revenue_per_available_hour = float(metrics.get('revenue_per_available_hour', 25))
-    features.extend([
-        total_earnings_30d, avg_earnings_per_session, earnings_trend,
-        premium_tier_sessions_ratio, discount_sessions_ratio, payment_disputes_30d,
-        refund_rate_30d, pricing_competitiveness_score, revenue_per_available_hour
-    ])
-
-    return np.array(features, dtype=np.float32)
+# Raw student metrics read straight from the entity record: (metric key, default).
+# Derived columns (frequencies, gaps, trends, IB call rate) are computed from these.
+STUDENT_RAW_FEATURES = (
+    # Session counts
+    ('sessions_7d', 0.0),
+    ('sessions_14d', 0.0),
+    ('sessions_30d', 0.0),
+    # Session gaps and trends
+    ('days_since_last_session', 30.0),
+    ('sessions_weekend_ratio', 0.3),
+    ('sessions_evening_ratio', 0.5),
+    # Engagement
+    ('avg_rating', 0.0),
+    ('rating_trend', 0.0),
+    ('rating_volatility', 0.0),
+    ('avg_session_duration_min', 60.0),
+    ('total_session_hours_30d', 0.0),
+    ('engagement_score', 50.0),
+    ('questions_asked_30d', 0.0),
+    ('materials_accessed_30d', 0.0),
+    # Financial
+    ('payment_success_rate_30d', 1.0),
+    ('payment_failures_30d', 0.0),
+    ('avg_transaction_value', 50.0),
+    ('total_revenue_30d', 0.0),
+    ('payment_method_count', 1.0),
+    ('days_since_last_payment', 7.0),
+    # Behavioral
+    ('ib_calls_7d', 0.0),
+    ('ib_calls_14d', 0.0),
+    ('cancellation_rate_7d', 0.0),
+    ('cancellation_rate_30d', 0.0),
+    ('no_show_rate_30d', 0.0),
+    ('late_cancellations_30d', 0.0),
+    ('avg_response_time_hours', 24.0),
+    ('support_tickets_30d', 0.0),
+    ('complaints_30d', 0.0),
+    # Tutor
+    ('tutor_consistency_score', 0.5),
+    ('unique_tutors_30d', 1.0),
+    ('preferred_tutor_ratio', 0.7),
+    ('tutor_rating_avg', 4.0),
+    ('tutor_availability_score', 0.8),
+    ('tutor_subject_expertise_score', 0.7),
+    ('tutor_match_score', 0.75),
+    ('tutor_changed_count_30d', 0.0),
+    ('preferred_tutor_sessions_ratio', 0.8),
+)
+
+# Raw tutor metrics: (metric key, default). Session frequencies are derived.
+TUTOR_RAW_FEATURES = (
+    # Session Performance
+    ('sessions_taught_7d', 0.0),
+    ('sessions_taught_14d', 0.0),
+    ('sessions_taught_30d', 0.0),
+    ('sessions_completed_7d', 0.0),
+    ('sessions_completed_14d', 0.0),
+    ('sessions_completed_30d', 0.0),
+    ('avg_session_duration_min', 60.0),
+    ('session_completion_rate', 0.95),
+    ('no_show_rate', 0.0),
+    ('cancellation_rate', 0.0),
+    ('days_since_last_session', 7.0),
+    # Student Satisfaction
+    ('avg_rating', 4.5),
+    ('rating_trend', 0.0),
+    ('rating_volatility', 0.0),
+    ('positive_reviews_count_30d', 0.0),
+    ('negative_reviews_count_30d', 0.0),
+    ('student_retention_rate', 0.7),
+    ('unique_students_30d', 10.0),
+    ('avg_student_lifetime_sessions', 5.0),
+    # Availability & Capacity
+    ('available_hours_this_week', 20.0),
+    ('available_hours_next_week', 20.0),
+    ('utilization_rate', 0.6),
+    ('instant_book_enabled', 1.0),
+    ('avg_response_time_hours', 2.0),
+    ('booking_lead_time_avg_hours', 48.0),
+    # Subject Expertise
+    ('primary_subject_count', 1.0),
+    ('subject_diversity_score', 0.5),
+    ('avg_rating_by_subject', 4.5),
+    ('sessions_per_subject_30d', 10.0),
+    ('subject_match_accuracy', 0.8),
+    ('certification_count', 2.0),
+    ('years_of_experience', 3.0),
+    ('specialization_score', 0.7),
+    ('advanced_topics_count', 1.0),
+    ('student_grade_improvement_avg', 10.0),
+    # Financial & Business
+    ('total_earnings_30d', 1000.0),
+    ('avg_earnings_per_session', 50.0),
+    ('earnings_trend', 0.0),
+    ('premium_tier_sessions_ratio', 0.3),
+    ('discount_sessions_ratio', 0.1),
+    ('payment_disputes_count_30d', 0.0),
+    ('refund_rate_30d', 0.0),
+    ('pricing_competitiveness_score', 0.75),
+    ('revenue_per_available_hour', 25.0),
+)
+
+# Coerced raw metrics for one entity, field per spec key; handed to
+# generate_recommendations so it reuses the extracted floats instead of the record
+StudentRawMetrics = namedtuple('StudentRawMetrics', [key for key, _ in STUDENT_RAW_FEATURES])
+TutorRawMetrics = namedtuple('TutorRawMetrics', [key for key, _ in TUTOR_RAW_FEATURES])
+
+RAW_FEATURE_SPECS = {
+    'student': (STUDENT_RAW_FEATURES, StudentRawMetrics),
+    'tutor': (TUTOR_RAW_FEATURES, TutorRawMetrics),
+}
+
+def extract_raw_features(items: List[Dict[str, Any]], spec: Tuple[Tuple[str, float], ...]) -> np.ndarray:
+    """Pull the raw metric columns described by spec into an (N, len(spec)) float64 matrix"""
+    keys = [key for key, _ in spec]
+    defaults = [default for _, default in spec]
+
+    # map(item.get, keys, defaults) does the lookups in C; fromiter converts the
+    # Decimal values to float64 straight into one preallocated buffer
+    raw = np.fromiter(
+        chain.from_iterable(map(item.get, keys, defaults) for item in items),
+        dtype=np.float64,
+        count=len(items) * len(spec)
+    )
+    return raw.reshape(len(items), len(spec))
+
+# Session window lengths in days; module globals are frozen into the Numba kernels
+# at compile time, so these fold to constants exactly like literals
+WINDOW_7D = 7.0
+WINDOW_14D = 14.0
+WINDOW_30D = 30.0
+
+@njit('void(float64[:, ::1], float32[:, ::1])', fastmath=True)
+def _compute_student_features(raw: np.ndarray, out: np.ndarray) -> None:
+    """Write the 46 student features for every row of raw into out (compiled at import when Numba is available)"""
+    for i in range(raw.shape[0]):
+        sessions_7d = raw[i, 0]
+        sessions_14d = raw[i, 1]
+        sessions_30d = raw[i, 2]
+
+        # Session counts and frequencies (6 features)
+        out[i, 0] = sessions_7d
+        out[i, 1] = sessions_14d
+        out[i, 2] = sessions_30d
+        out[i, 3] = sessions_7d / WINDOW_7D
+        out[i, 4] = sessions_14d / WINDOW_14D
+        out[i, 5] = sessions_30d / WINDOW_30D
+
+        # Session gaps and trends (7 features)
+        session_trend_7d_14d = sessions_7d - (sessions_14d - sessions_7d) if sessions_14d > sessions_7d else 0.0
+        session_trend_14d_30d = sessions_14d - (sessions_30d - sessions_14d) if sessions_30d > sessions_14d else 0.0
+        out[i, 6] = raw[i, 3]
+        out[i, 7] = WINDOW_30D / sessions_30d if sessions_30d > 0 else WINDOW_30D
+        out[i, 8] = session_trend_7d_14d
+        out[i, 9] = session_trend_14d_30d
+        out[i, 10] = session_trend_7d_14d - session_trend_14d_30d
+        out[i, 11] = raw[i, 4]
+        out[i, 12] = raw[i, 5]
+
+        # Engagement (8) + Financial (6) features
+        for j in range(14):
+            out[i, 13 + j] = raw[i, 6 + j]
+
+        # Behavioral features (10): IB calls, derived IB call rate, the rest raw
+        out[i, 27] = raw[i, 20]
+        out[i, 28] = raw[i, 21]
+        out[i, 29] = raw[i, 21] / WINDOW_14D
+
+        # Remaining behavioral (7) + Tutor (9) features
+        for j in range(16):
+            out[i, 30 + j] = raw[i, 22 + j]
+
+@njit('void(float64[:, ::1], float32[:, ::1])', fastmath=True)
+def _compute_tutor_features(raw: np.ndarray, out: np.ndarray) -> None:
+    """Write the 46 tutor features for every row of raw into out (compiled at import when Numba is available)"""
+    for i in range(raw.shape[0]):
+        for j in range(11):
+            out[i, j] = raw[i, j]
+        out[i, 11] = raw[i, 0] / WINDOW_7D   # session_frequency_7d
+        out[i, 12] = raw[i, 1] / WINDOW_14D  # session_frequency_14d
+        for j in range(33):
+            out[i, 13 + j] = raw[i, 11 + j]
+
+def _compute_student_features_numpy(raw: np.ndarray, out: np.ndarray) -> None:
+    """Array-expression equivalent of _compute_student_features for when Numba is unavailable"""
+    sessions_7d = raw[:, 0]
+    sessions_14d = raw[:, 1]
+    sessions_30d = raw[:, 2]
+
+    # Session counts and frequencies (6 features)
+    out[:, 0:3] = raw[:, 0:3]
+    out[:, 3] = sessions_7d / WINDOW_7D
+    out[:, 4] = sessions_14d / WINDOW_14D
+    out[:, 5] = sessions_30d / WINDOW_30D
 
-def engineer_features(metrics: Dict[str, Any], entity_type: str = 'student') -> np.ndarray:
+    # Session gaps and trends (7 features)
+    session_trend_7d_14d = np.where(sessions_14d > sessions_7d, sessions_7d - (sessions_14d - sessions_7d), 0.0)
+    session_trend_14d_30d = np.where(sessions_30d > sessions_14d, sessions_14d - (sessions_30d - sessions_14d), 0.0)
+    out[:, 6] = raw[:, 3]
+    out[:, 7] = np.divide(WINDOW_30D, sessions_30d, out=np.full_like(sessions_30d, WINDOW_30D), where=sessions_30d > 0)
+    out[:, 8] = session_trend_7d_14d
+    out[:, 9] = session_trend_14d_30d
+    out[:, 10] = session_trend_7d_14d - session_trend_14d_30d
+    out[:, 11:13] = raw[:, 4:6]
+
+    # Engagement (8) + Financial (6) features
+    out[:, 13:27] = raw[:, 6:20]
+
+    # Behavioral features (10): IB calls, derived IB call rate, the rest raw
+    out[:, 27:29] = raw[:, 20:22]
+    out[:, 29] = raw[:, 21] / WINDOW_14D
+
+    # Remaining behavioral (7) + Tutor (9) features
+    out[:, 30:46] = raw[:, 22:38]
+
+def _compute_tutor_features_numpy(raw: np.ndarray, out: np.ndarray) -> None:
+    """Array-expression equivalent of _compute_tutor_features for when Numba is unavailable"""
+    out[:, 0:11] = raw[:, 0:11]
+    out[:, 11] = raw[:, 0] / WINDOW_7D   # session_frequency_7d
+    out[:, 12] = raw[:, 1] / WINDOW_14D  # session_frequency_14d
+    out[:, 13:46] = raw[:, 11:44]
+
+if not NUMBA_AVAILABLE:
+    # Interpreted row loops are far slower than whole-column NumPy expressions
+    _compute_student_features = _compute_student_features_numpy
+    _compute_tutor_features = _compute_tutor_features_numpy
+
+def raw_metric_rows(raw: np.ndarray, entity_type: str = 'student') -> List[Tuple[float, ...]]:
+    """Wrap each row of an extracted raw matrix in the entity type's raw-metrics namedtuple"""
+    _, row_type = RAW_FEATURE_SPECS.get(entity_type, RAW_FEATURE_SPECS['student'])
+    return [row_type._make(row) for row in raw.tolist()]
+
+def engineer_features_batch(
+    items: List[Dict[str, Any]],
+    entity_type: str = 'student',
+    out: Optional[np.ndarray] = None,
+    raw: Optional[np.ndarray] = None
+) -> np.ndarray:
     """
-    Engineer 46 features for TensorFlow multi-task model
+    Engineer 46 features for a batch of entities as an (N, 46) float32 matrix
 
     Supports both student and tutor entities with appropriate feature engineering.
+    Pass a preallocated float32 out buffer of shape (N, 46) to avoid a per-call allocation,
+    and raw when the caller already ran extract_raw_features on items.
 
-    Feature Groups:
+    Student Feature Groups:
     - Session features (13): counts, frequencies, gaps
     - Engagement features (8): ratings, consistency, velocity
     - Financial features (6): payment success, transaction patterns
     - Behavioral features (10): cancellations, IB calls, responsiveness
     - Tutor features (9): consistency, availability, performance
+
+    Tutor Feature Groups:
+    - Session Performance (13): taught counts, completion rates, gaps
+    - Student Satisfaction (8): ratings, reviews, retention
+    - Availability & Capacity (6): hours, utilization, response time
+    - Subject Expertise (10): diversity, certifications, match accuracy
+    - Financial & Business (9): earnings, pricing, revenue
     """
-    if entity_type == 'tutor':
-        return engineer_tutor_features(metrics)
+    if out is None:
+        out = np.empty((len(items), FEATURE_COUNT), dtype=np.float32)
 
-    features = []
+    if raw is None:
+        spec, _ = RAW_FEATURE_SPECS.get(entity_type, RAW_FEATURE_SPECS['student'])
+        raw = extract_raw_features(items, spec)
 
-    # Session counts (3 features)
-    sessions_7d = float(metrics.get('sessions_7d', 0))
-    sessions_14d = float(metrics.get('sessions_14d', 0))
-    sessions_30d = float(metrics.get('sessions_30d', 0))
-    features.extend([sessions_7d, sessions_14d, sessions_30d])
+    if entity_type == 'tutor':
+        _compute_tutor_features(raw, out)
+    else:
+        _compute_student_features(raw, out)
 
-    # Session frequencies (3 features)
-    session_freq_7d = sessions_7d / 7.0
-    session_freq_14d = sessions_14d / 14.0
-    session_freq_30d = sessions_30d / 30.0
-    features.extend([session_freq_7d, session_freq_14d, session_freq_30d])
+    return out
 
-    # Session gaps and trends (7 features)
-    days_since_last = float(metrics.get('days_since_last_session', 30))
-    avg_gap_between_sessions = (30.0 / sessions_30d) if sessions_30d > 0 else 30.0
-    session_trend_7d_14d = sessions_7d - (sessions_14d - sessions_7d) if sessions_14d > sessions_7d else 0
-    session_trend_14d_30d = sessions_14d - (sessions_30d - sessions_14d) if sessions_30d > sessions_14d else 0
-    session_acceleration = session_trend_7d_14d - session_trend_14d_30d
-    sessions_weekend_ratio = float(metrics.get('sessions_weekend_ratio', 0.3))
-    sessions_evening_ratio = float(metrics.get('sessions_evening_ratio', 0.5))
-    features.extend([
-        days_since_last,
-        avg_gap_between_sessions,
-        session_trend_7d_14d,
-        session_trend_14d_30d,
-        session_acceleration,
-        sessions_weekend_ratio,
-        sessions_evening_ratio
-    ])
-
-    # Engagement features (8 features)
-    avg_rating = float(metrics.get('avg_rating', 0))
-    rating_trend = float(metrics.get('rating_trend', 0))
-    rating_volatility = float(metrics.get('rating_volatility', 0))
-    avg_session_duration_min = float(metrics.get('avg_session_duration_min', 60))
-    total_session_hours = float(metrics.get('total_session_hours_30d', 0))
-    engagement_score = float(metrics.get('engagement_score', 50))
-    questions_asked_30d = float(metrics.get('questions_asked_30d', 0))
-    materials_accessed_30d = float(metrics.get('materials_accessed_30d', 0))
-    features.extend([
-        avg_rating,
-        rating_trend,
-        rating_volatility,
-        avg_session_duration_min,
-        total_session_hours,
-        engagement_score,
-        questions_asked_30d,
-        materials_accessed_30d
-    ])
-
-    # Financial features (6 features)
-    payment_success_rate = float(metrics.get('payment_success_rate_30d', 1.0))
-    payment_failures_30d = float(metrics.get('payment_failures_30d', 0))
-    avg_transaction_value = float(metrics.get('avg_transaction_value', 50))
-    total_revenue_30d = float(metrics.get('total_revenue_30d', 0))
-    payment_method_count = float(metrics.get('payment_method_count', 1))
-    days_since_last_payment = float(metrics.get('days_since_last_payment', 7))
-    features.extend([
-        payment_success_rate,
-        payment_failures_30d,
-        avg_transaction_value,
-        total_revenue_30d,
-        payment_method_count,
-        days_since_last_payment
-    ])
-
-    # Behavioral features (10 features)
-    ib_calls_7d = float(metrics.get('ib_calls_7d', 0))
-    ib_calls_14d = float(metrics.get('ib_calls_14d', 0))
-    ib_call_rate = ib_calls_14d / 14.0
-    cancellation_rate_7d = float(metrics.get('cancellation_rate_7d', 0))
-    cancellation_rate_30d = float(metrics.get('cancellation_rate_30d', 0))
-    no_show_rate_30d = float(metrics.get('no_show_rate_30d', 0))
-    late_cancellations_30d = float(metrics.get('late_cancellations_30d', 0))
-    response_time_hours = float(metrics.get('avg_response_time_hours', 24))
-    support_tickets_30d = float(metrics.get('support_tickets_30d', 0))
-    complaints_30d = float(metrics.get('complaints_30d', 0))
-    features.extend([
-        ib_calls_7d,
-        ib_calls_14d,
-        ib_call_rate,
-        cancellation_rate_7d,
-        cancellation_rate_30d,
-        no_show_rate_30d,
-        late_cancellations_30d,
-        response_time_hours,
-        support_tickets_30d,
-        complaints_30d
-    ])
-
-    # Tutor features (9 features)
-    tutor_consistency_score = float(metrics.get('tutor_consistency_score', 0.5))
-    unique_tutors_30d = float(metrics.get('unique_tutors_30d', 1))
-    preferred_tutor_ratio = float(metrics.get('preferred_tutor_ratio', 0.7))
-    tutor_rating_avg = float(metrics.get('tutor_rating_avg', 4.0))
-    tutor_availability_score = float(metrics.get('tutor_availability_score', 0.8))
-    tutor_subject_expertise = float(metrics.get('tutor_subject_expertise_score', 0.7))
-    tutor_match_score = float(metrics.get('tutor_match_score', 0.75))
-    tutor_changed_count_30d = float(metrics.get('tutor_changed_count_30d', 0))
-    preferred_tutor_sessions_ratio = float(metrics.get('preferred_tutor_sessions_ratio', 0.8))
-    features.extend([
-        tutor_consistency_score,
-        unique_tutors_30d,
-        preferred_tutor_ratio,
-        tutor_rating_avg,
-        tutor_availability_score,
-        tutor_subject_expertise,
-        tutor_match_score,
-        tutor_changed_count_30d,
-        preferred_tutor_sessions_ratio
-    ])
-
-    return np.array(features, dtype=np.float32)
-
-def invoke_sagemaker(features: np.ndarray) -> Dict[str, float]:
+def engineer_features(metrics: Dict[str, Any], entity_type: str = 'student') -> np.ndarray:
+    """Engineer the 46-feature vector for a single entity (see engineer_features_batch)"""
+    return engineer_features_batch([metrics], entity_type)[0]
+
+# Output order of the multi-task model's array response format
+PREDICTION_KEYS = (
+    'first_session_success',
+    'session_velocity',
+    'churn_risk_14d',
+    'churn_risk_30d',
+    'health_score',
+)
+
+# Conservative defaults used when the endpoint call fails
+DEFAULT_PREDICTIONS = {
+    'first_session_success': 0.5,
+    'session_velocity': 0.0,
+    'churn_risk_14d': 0.5,
+    'churn_risk_30d': 0.5,
+    'health_score': 50.0,
+}
+
+def parse_prediction(prediction: Any) -> Dict[str, float]:
+    """Convert a single TensorFlow prediction (dict or array format) to a predictions dict"""
+    if isinstance(prediction, dict):
+        # Dict format: {"health_score": [value], "session_velocity": [value], ...}
+        return {key: float(prediction[key][0]) for key in PREDICTION_KEYS}
+
+    # Array format: [val1, val2, val3, val4, val5]
+    return {key: float(value) for key, value in zip(PREDICTION_KEYS, prediction)}
+
+def encode_features(features: np.ndarray) -> Any:
+    """Serialize an (N, 46) feature matrix in the endpoint's configured content type"""
+    if SAGEMAKER_CONTENT_TYPE == 'text/csv':
+        # One CSV row per entity; the whole payload is formatted by a single bytes %-operation
+        return b'\n'.join([CSV_ROW_FORMAT] * len(features)) % tuple(features.ravel().tolist())
+
+    # TF Serving row format: orjson serializes the float32 matrix natively, straight to bytes
+    if orjson is not None:
+        return orjson.dumps({'instances': np.ascontiguousarray(features)}, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps({'instances': features.tolist()})
+
+def invoke_sagemaker(features: np.ndarray) -> List[Dict[str, float]]:
     """
-    Invoke TensorFlow multi-task model on SageMaker endpoint
+    Invoke TensorFlow multi-task model on SageMaker endpoint for a batch of entities
+
+    Rows are sent in requests of at most SAGEMAKER_MAX_BATCH_SIZE; a failed request
+    falls back to default predictions for its rows only.
+
+    Args:
+        features: (N, 46) feature matrix, or a single 46-feature vector
 
     Returns:
-        Dictionary with 5 predictions:
+        One dictionary per row with 5 predictions:
         - first_session_success: probability (0-1)
         - session_velocity: sessions per week
         - churn_risk_14d: probability (0-1)
         - churn_risk_30d: probability (0-1)
         - health_score: 0-100
     """
-    try:
-        # Convert features to CSV format (TensorFlow endpoint expects CSV)
-        payload = ','.join(map(str, features))
+    features = np.atleast_2d(features)
 
+    predictions = []
+    for start in range(0, len(features), SAGEMAKER_MAX_BATCH_SIZE):
+        predictions.extend(invoke_sagemaker_request(features[start:start + SAGEMAKER_MAX_BATCH_SIZE]))
+    return predictions
+
+def invoke_sagemaker_request(features: np.ndarray) -> List[Dict[str, float]]:
+    """Single InvokeEndpoint call for an (N, 46) matrix within the endpoint's batch limit"""
+    try:
         response = sagemaker_runtime.invoke_endpoint(
             EndpointName=ENDPOINT_NAME,
-            ContentType='text/csv',
-            Body=payload
+            ContentType=SAGEMAKER_CONTENT_TYPE,
+            Accept=SAGEMAKER_ACCEPT,
+            Body=encode_features(features)
         )
 
-        # Parse TensorFlow response
-        result = json.loads(response['Body'].read().decode())
-        predictions = result['predictions'][0]  # TensorFlow format: {"predictions": [{...}]}
-
-        # Handle both array and dict response formats
-        if isinstance(predictions, dict):
-            # Dict format: {"health_score": [value], "session_velocity": [value], ...}
-            return {
-                'first_session_success': float(predictions['first_session_success'][0]),
-                'session_velocity': float(predictions['session_velocity'][0]),
-                'churn_risk_14d': float(predictions['churn_risk_14d'][0]),
-                'churn_risk_30d': float(predictions['churn_risk_30d'][0]),
-                'health_score': float(predictions['health_score'][0]),
-            }
-        else:
-            # Array format: [val1, val2, val3, val4, val5]
-            return {
-                'first_session_success': float(predictions[0]),
-                'session_velocity': float(predictions[1]),
-                'churn_risk_14d': float(predictions[2]),
-                'churn_risk_30d': float(predictions[3]),
-                'health_score': float(predictions[4]),
-            }
+        body = response['Body'].read()
+
+        if SAGEMAKER_ACCEPT == 'application/octet-stream':
+            # Raw tensor: one float32 row per entity, columns in PREDICTION_KEYS order
+            values = np.frombuffer(body, dtype='<f4').reshape(-1, len(PREDICTION_KEYS))
+            if len(values) != len(features):
+                raise ValueError(f"Expected {len(features)} predictions, got {len(values)}")
+            return [dict(zip(PREDICTION_KEYS, row)) for row in values.tolist()]
+
+        # Parse TensorFlow response: {"predictions": [row_1, row_2, ...]}
+        result = orjson.loads(body) if orjson is not None else json.loads(body.decode())
+        predictions = result['predictions']
+
+        if len(predictions) != len(features):
+            raise ValueError(f"Expected {len(features)} predictions, got {len(predictions)}")
+
+        return [parse_prediction(prediction) for prediction in predictions]
 
     except Exception as e:
         print(f"Error invoking SageMaker: {e}")
         # Return conservative defaults on error
-        return {
-            'first_session_success': 0.5,
-            'session_velocity': 0.0,
-            'churn_risk_14d': 0.5,
-            'churn_risk_30d': 0.5,
-            'health_score': 50.0,
-        }
+        return [dict(DEFAULT_PREDICTIONS) for _ in range(len(features))]
+
+# Segment thresholds shared by classify_segment and classify_segments
+# (churn_risk_14d doubles as burnout risk for tutors)
+SEVERE_CHURN_RISK = 0.7
+ELEVATED_CHURN_RISK = 0.4
+ELEVATED_CHURN_RISK_30D = 0.6
+LOW_CHURN_RISK = 0.2
+CRITICAL_HEALTH = 40
+DECLINING_HEALTH = 60
+STRONG_HEALTH = 80
 
 def classify_segment(predictions: Dict[str, float], entity_type: str = 'student') -> str:
     """
@@ -326,11 +496,11 @@ def classify_segment(predictions: Dict[str, float], entity_type: str = 'student'
         burnout = predictions.get('churn_risk_14d', 0)  # Reinterpreted as burnout_risk for tutors
         health = predictions['health_score']
 
-        if burnout > 0.7 or health < 40:
+        if burnout > SEVERE_CHURN_RISK or health < CRITICAL_HEALTH:
             return 'churning'
-        elif burnout > 0.4 or health < 60:
+        elif burnout > ELEVATED_CHURN_RISK or health < DECLINING_HEALTH:
             return 'at_risk'
-        elif burnout < 0.2 and health > 80:
+        elif burnout < LOW_CHURN_RISK and health > STRONG_HEALTH:
             return 'star'
         else:
             return 'healthy'
@@ -340,17 +510,65 @@ def classify_segment(predictions: Dict[str, float], entity_type: str = 'student'
     churn_30d = predictions['churn_risk_30d']
     health = predictions['health_score']
 
-    if churn_14d > 0.7 or health < 40:
+    if churn_14d > SEVERE_CHURN_RISK or health < CRITICAL_HEALTH:
         return 'churned'
-    elif churn_14d > 0.4 or churn_30d > 0.6 or health < 60:
+    elif churn_14d > ELEVATED_CHURN_RISK or churn_30d > ELEVATED_CHURN_RISK_30D or health < DECLINING_HEALTH:
         return 'at_risk'
-    elif churn_14d < 0.2 and health > 80:
+    elif churn_14d < LOW_CHURN_RISK and health > STRONG_HEALTH:
         return 'thriving'
     else:
         return 'healthy'
 
-def generate_recommendations(metrics: Dict[str, Any], predictions: Dict[str, float], segment: str, entity_type: str = 'student') -> List[str]:
-    """Generate actionable recommendations based on predictions and metrics"""
+# Segment names indexed by the integer labels classify_segments produces
+SEGMENT_NAMES = {
+    'student': ('thriving', 'healthy', 'at_risk', 'churned'),
+    'tutor': ('star', 'healthy', 'at_risk', 'churning'),
+}
+
+def prediction_columns(predictions: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """churn_risk_14d, churn_risk_30d and health_score of a page of predictions as float64 columns"""
+    churn_14d = np.array([p['churn_risk_14d'] for p in predictions], dtype=np.float64)
+    churn_30d = np.array([p['churn_risk_30d'] for p in predictions], dtype=np.float64)
+    health = np.array([p['health_score'] for p in predictions], dtype=np.float64)
+    return churn_14d, churn_30d, health
+
+def classify_segments(predictions: List[Dict[str, float]], entity_type: str = 'student') -> np.ndarray:
+    """
+    Vectorized classify_segment over a page of predictions.
+    Returns int8 labels indexing SEGMENT_NAMES[entity_type] (0=best .. 3=worst).
+    """
+    return classify_segment_columns(*prediction_columns(predictions), entity_type)
+
+def classify_segment_columns(
+    churn_14d: np.ndarray,
+    churn_30d: np.ndarray,
+    health: np.ndarray,
+    entity_type: str = 'student'
+) -> np.ndarray:
+    """classify_segments on columns already extracted with prediction_columns"""
+    at_risk = (churn_14d > ELEVATED_CHURN_RISK) | (health < DECLINING_HEALTH)
+    if entity_type != 'tutor':
+        # Only students use the 30-day horizon for at_risk
+        at_risk |= churn_30d > ELEVATED_CHURN_RISK_30D
+
+    return np.select(
+        [
+            (churn_14d > SEVERE_CHURN_RISK) | (health < CRITICAL_HEALTH),
+            at_risk,
+            (churn_14d < LOW_CHURN_RISK) & (health > STRONG_HEALTH),
+        ],
+        [3, 2, 0],
+        default=1
+    ).astype(np.int8)
+
+def generate_recommendations(raw: Tuple[float, ...], predictions: Dict[str, float], segment: str, entity_type: str = 'student') -> List[str]:
+    """
+    Generate actionable recommendations based on predictions and metrics
+
+    raw is the entity's StudentRawMetrics / TutorRawMetrics row (see raw_metric_rows).
+    Its spec defaults for absent metrics fall on the same side of every threshold
+    below as the record defaults used previously.
+    """
     recommendations = []
 
     if entity_type == 'tutor':
@@ -360,16 +578,16 @@ def generate_recommendations(metrics: Dict[str, Any], predictions: Dict[str, flo
         if burnout_risk > 0.6:
             recommendations.append("⚠️ HIGH BURNOUT RISK: Schedule wellness check-in within 48 hours")
 
-        if float(metrics.get('utilization_rate', 0)) > 0.9:
+        if raw.utilization_rate > 0.9:
             recommendations.append("High utilization - suggest reducing hours or adding breaks")
 
-        if float(metrics.get('avg_rating', 5.0)) < 4.0:
+        if raw.avg_rating < 4.0:
             recommendations.append("Low ratings detected - provide coaching or additional training")
 
         if predictions['session_velocity'] < 0.5:
             recommendations.append("Low booking rate - increase visibility or marketing support")
 
-        if float(metrics.get('student_retention_rate', 1.0)) < 0.5:
+        if raw.student_retention_rate < 0.5:
             recommendations.append("Low student retention - review teaching style and student feedback")
 
         if segment == 'star':
@@ -381,19 +599,19 @@ def generate_recommendations(metrics: Dict[str, Any], predictions: Dict[str, flo
     if predictions['churn_risk_14d'] > 0.6:
         recommendations.append("⚠️ HIGH CHURN RISK: Schedule proactive check-in call within 48 hours")
 
-        if float(metrics.get('sessions_7d', 0)) == 0:
+        if raw.sessions_7d == 0:
             recommendations.append("No sessions in 7 days - send re-engagement campaign")
 
-        if float(metrics.get('ib_calls_14d', 0)) >= 2:
+        if raw.ib_calls_14d >= 2:
             recommendations.append("Multiple IB calls detected - assign dedicated account manager")
 
     if predictions['session_velocity'] < 0.5 and segment != 'churned':
         recommendations.append("Low session frequency - offer scheduling assistance or flexible hours")
 
-    if float(metrics.get('payment_success_rate_30d', 1.0)) < 0.9:
+    if raw.payment_success_rate_30d < 0.9:
         recommendations.append("Payment failures detected - update billing information")
 
-    if float(metrics.get('tutor_consistency_score', 1.0)) < 0.5:
+    if raw.tutor_consistency_score < 0.5:
         recommendations.append("Low tutor consistency - assign preferred tutor for better match")
 
     if predictions['first_session_success'] < 0.5:
@@ -404,200 +622,307 @@ def generate_recommendations(metrics: Dict[str, Any], predictions: Dict[str, flo
 
     return recommendations[:5]
 
+# One insight to write for an entity, before conversion to a DynamoDB item
+InsightSpec = namedtuple('InsightSpec', ['prediction_type', 'risk_score', 'explanation', 'confidence'])
+
+# Insights of one entity are spread 100 ms apart so their timestamps stay distinct
+INSIGHT_TIMESTAMP_STEP = timedelta(microseconds=100000)
+MAX_INSIGHTS_PER_ENTITY = 6
+INSIGHT_TTL = timedelta(days=30)
+
+@lru_cache(maxsize=4)
+def clock_strings(now: datetime) -> Tuple[str, str, Tuple[str, ...]]:
+    """
+    ISO timestamp, insight TTL (epoch seconds) and per-insight ISO timestamps for one
+    invocation clock reading. Every entity of a run shares now, so these are formatted
+    once per run instead of once per entity.
+    """
+    insight_timestamps = tuple(
+        (now + idx * INSIGHT_TIMESTAMP_STEP).isoformat() for idx in range(MAX_INSIGHTS_PER_ENTITY)
+    )
+    return now.isoformat(), str(int((now + INSIGHT_TTL).timestamp())), insight_timestamps
+
 def create_insights_from_predictions(
     entity_id: str,
     predictions: Dict[str, float],
     segment: str,
     recommendations: List[str],
-    metrics: Dict[str, Any]
-) -> None:
+    metrics: Dict[str, Any],
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
     """
-    Create insight records in DynamoDB from SageMaker predictions.
-    Generates 3-6 insight types based on prediction thresholds.
+    Build insight records for DynamoDB from SageMaker predictions.
+    Generates 3-6 insight types based on prediction thresholds and returns
+    them as low-level DynamoDB items for write_insights.
     """
-    import random
-    import time
-
-    # Generate base timestamp for TTL calculation
-    base_timestamp = datetime.utcnow()
-    ttl = int((base_timestamp + timedelta(days=30)).timestamp())
+    # Base timestamp (the invocation's clock reading when provided) for TTL and insight timestamps
+    _, ttl, insight_timestamps = clock_strings(now or datetime.utcnow())
 
     insights_to_create = []
 
+    # Hoist prediction lookups; velocity/health are formatted once and reused by
+    # every explanation (both appear in the two insights that always fire)
+    churn_14d = predictions['churn_risk_14d']
+    churn_30d = predictions['churn_risk_30d']
+    health = predictions['health_score']
+    velocity = predictions['session_velocity']
+    first_session = predictions['first_session_success']
+    velocity_str = f"{velocity:.2f}"
+    health_str = f"{health:.0f}"
+
     # 1. Churn Risk Insight - if 14d or 30d risk > 30%
-    max_churn = max(predictions['churn_risk_14d'], predictions['churn_risk_30d'])
+    max_churn = max(churn_14d, churn_30d)
     if max_churn > 0.3:
         risk_score = int(max_churn * 100)
-        explanation = f"Student shows {risk_score}% churn probability. "
-        if predictions['churn_risk_14d'] > 0.5:
-            explanation += "High risk of churning within 14 days. "
-        elif predictions['churn_risk_30d'] > 0.5:
-            explanation += "Elevated risk of churning within 30 days. "
-        explanation += f"Session velocity: {predictions['session_velocity']:.2f}/week, Health score: {predictions['health_score']:.0f}/100."
-
-        insights_to_create.append({
-            'prediction_type': 'churn_risk',
-            'risk_score': risk_score,
-            'explanation': explanation,
-            'confidence': 0.85
-        })
+        if churn_14d > 0.5:
+            horizon_note = "High risk of churning within 14 days. "
+        elif churn_30d > 0.5:
+            horizon_note = "Elevated risk of churning within 30 days. "
+        else:
+            horizon_note = ""
+        explanation = (
+            f"Student shows {risk_score}% churn probability. {horizon_note}"
+            f"Session velocity: {velocity_str}/week, Health score: {health_str}/100."
+        )
+
+        insights_to_create.append(InsightSpec(
+            prediction_type='churn_risk',
+            risk_score=risk_score,
+            explanation=explanation,
+            confidence=0.85
+        ))
 
     # 2. Customer Health Insight - if health score < 70
-    if predictions['health_score'] < 70:
-        risk_score = int(100 - predictions['health_score'])
-        explanation = f"Overall health score of {predictions['health_score']:.0f}/100 indicates {segment} status. "
-        explanation += f"Session frequency: {predictions['session_velocity']:.2f}/week. "
-        if metrics.get('avg_rating', 0) < 4.0:
-            explanation += "Low satisfaction ratings detected. "
-
-        insights_to_create.append({
-            'prediction_type': 'customer_health',
-            'risk_score': risk_score,
-            'explanation': explanation,
-            'confidence': 0.88
-        })
+    if health < 70:
+        risk_score = int(100 - health)
+        rating_note = "Low satisfaction ratings detected. " if metrics.get('avg_rating', 0) < 4.0 else ""
+        explanation = (
+            f"Overall health score of {health_str}/100 indicates {segment} status. "
+            f"Session frequency: {velocity_str}/week. {rating_note}"
+        )
+
+        insights_to_create.append(InsightSpec(
+            prediction_type='customer_health',
+            risk_score=risk_score,
+            explanation=explanation,
+            confidence=0.88
+        ))
 
     # 3. Session Quality Insight - if session velocity < 0.5/week
-    if predictions['session_velocity'] < 0.5:
-        risk_score = int((0.5 - predictions['session_velocity']) * 200)  # Scale to 0-100
+    if velocity < 0.5:
+        risk_score = int((0.5 - velocity) * 200)  # Scale to 0-100
         risk_score = min(risk_score, 100)
-        explanation = f"Low session booking rate of {predictions['session_velocity']:.2f} sessions/week. "
         days_since = metrics.get('days_since_last_session', 0)
-        explanation += f"Last session {days_since:.0f} days ago. "
+        explanation = f"Low session booking rate of {velocity_str} sessions/week. Last session {days_since:.0f} days ago. "
 
-        insights_to_create.append({
-            'prediction_type': 'session_quality',
-            'risk_score': risk_score,
-            'explanation': explanation,
-            'confidence': 0.82
-        })
+        insights_to_create.append(InsightSpec(
+            prediction_type='session_quality',
+            risk_score=risk_score,
+            explanation=explanation,
+            confidence=0.82
+        ))
 
     # 4. First Session Success Insight - if probability < 60%
-    if predictions['first_session_success'] < 0.6:
-        risk_score = int((1 - predictions['first_session_success']) * 100)
-        explanation = f"First session success probability: {predictions['first_session_success']:.0%}. "
-        explanation += "Student may need additional onboarding support or tutor matching optimization."
-
-        insights_to_create.append({
-            'prediction_type': 'first_session_success',
-            'risk_score': risk_score,
-            'explanation': explanation,
-            'confidence': 0.79
-        })
+    if first_session < 0.6:
+        risk_score = int((1 - first_session) * 100)
+        explanation = (
+            f"First session success probability: {first_session:.0%}. "
+            "Student may need additional onboarding support or tutor matching optimization."
+        )
+
+        insights_to_create.append(InsightSpec(
+            prediction_type='first_session_success',
+            risk_score=risk_score,
+            explanation=explanation,
+            confidence=0.79
+        ))
 
     # 5. Tutor Capacity Insight - always generate for capacity planning
-    capacity_score = int(predictions['session_velocity'] * 20)  # Scale velocity to capacity metric
+    capacity_score = int(velocity * 20)  # Scale velocity to capacity metric
     capacity_score = min(capacity_score, 100)
-    explanation = f"Current session velocity: {predictions['session_velocity']:.2f}/week. "
-    if predictions['session_velocity'] > 2.0:
-        explanation += "High engagement - ensure tutor availability matches demand."
-    elif predictions['session_velocity'] < 0.5:
-        explanation += "Low engagement - may need tutor outreach or scheduling flexibility."
+    if velocity > 2.0:
+        engagement_note = "High engagement - ensure tutor availability matches demand."
+    elif velocity < 0.5:
+        engagement_note = "Low engagement - may need tutor outreach or scheduling flexibility."
     else:
-        explanation += "Moderate engagement - monitor for changes."
+        engagement_note = "Moderate engagement - monitor for changes."
 
-    insights_to_create.append({
-        'prediction_type': 'tutor_capacity',
-        'risk_score': 100 - capacity_score,  # Invert so high velocity = low risk
-        'explanation': explanation,
-        'confidence': 0.75
-    })
+    insights_to_create.append(InsightSpec(
+        prediction_type='tutor_capacity',
+        risk_score=100 - capacity_score,  # Invert so high velocity = low risk
+        explanation=f"Current session velocity: {velocity_str}/week. {engagement_note}",
+        confidence=0.75
+    ))
 
     # 6. Marketplace Balance - aggregate student patterns
-    balance_score = int(predictions['health_score'])
-    explanation = f"Student health: {predictions['health_score']:.0f}/100, Segment: {segment}. "
-    explanation += f"Churn risk: {max_churn:.0%}, Session velocity: {predictions['session_velocity']:.2f}/week."
-
-    insights_to_create.append({
-        'prediction_type': 'marketplace_balance',
-        'risk_score': 100 - balance_score,
-        'explanation': explanation,
-        'confidence': 0.80
-    })
-
-    # Write all insights to DynamoDB
-    for idx, insight_data in enumerate(insights_to_create):
-        # Generate unique timestamp for each insight (spread across 1 second)
-        insight_timestamp = base_timestamp + timedelta(microseconds=idx * 100000)
-        timestamp_iso = insight_timestamp.isoformat()
-
-        # Generate unique insight ID
-        random_suffix = ''.join(random.choices('0123456789abcdef', k=8))
-        insight_id = f"insight_{int(time.time() * 1000)}_{random_suffix}"
-
-        # Convert recommendations list to DynamoDB format
-        recs_list = [{'S': rec} for rec in recommendations[:3]]  # Limit to 3 recommendations
+    balance_score = int(health)
+
+    insights_to_create.append(InsightSpec(
+        prediction_type='marketplace_balance',
+        risk_score=100 - balance_score,
+        explanation=f"Student health: {health_str}/100, Segment: {segment}. Churn risk: {max_churn:.0%}, Session velocity: {velocity_str}/week.",
+        confidence=0.80
+    ))
+
+    # Attribute values shared by every insight of this entity, built once
+    # (the serializer only reads them, so items can share the same objects)
+    insight_type_attr = {'S': 'insight'}
+    related_entity_attr = {'S': entity_id}
+    recommendations_attr = {'L': [{'S': rec} for rec in recommendations[:3]]}  # Limit to 3 recommendations
+    model_used_attr = {'S': MODEL_VERSION}
+    ttl_attr = {'N': ttl}
+
+    # Build DynamoDB items for all insights
+    insight_items = []
+    for timestamp_iso, insight_data in zip(insight_timestamps, insights_to_create):
+        # Generate unique insight ID (64 random bits from a single uuid4)
+        insight_id = f"insight_{uuid.uuid4().hex[:16]}"
+
+        insight_items.append({
+            'entity_id': {'S': insight_id},
+            'entity_type': insight_type_attr,
+            'timestamp': {'S': timestamp_iso},
+            'related_entity': related_entity_attr,
+            'prediction_type': {'S': insight_data.prediction_type},
+            'risk_score': {'N': str(insight_data.risk_score)},
+            'explanation': {'S': insight_data.explanation},
+            'recommendations': recommendations_attr,
+            'model_used': model_used_attr,
+            'confidence': {'N': str(insight_data.confidence)},
+            'ttl': ttl_attr
+        })
+
+    return insight_items
+
+def write_insights(insight_items: List[Dict[str, Any]]) -> None:
+    """
+    Write insight items with BatchWriteItem (up to 25 items per request).
+    Unprocessed items are resubmitted with jittered exponential backoff.
+    """
+    written = 0
+
+    for start in range(0, len(insight_items), BATCH_WRITE_MAX_ITEMS):
+        chunk = insight_items[start:start + BATCH_WRITE_MAX_ITEMS]
+        request_items = {TABLE_NAME: [{'PutRequest': {'Item': item}} for item in chunk]}
+        attempt = 0
 
         try:
-            # Use low-level client for explicit attribute types
-            dynamodb_client = boto3.client('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-2'))
-
-            dynamodb_client.put_item(
-                TableName=TABLE_NAME,
-                Item={
-                    'entity_id': {'S': insight_id},
-                    'entity_type': {'S': 'insight'},
-                    'timestamp': {'S': timestamp_iso},
-                    'related_entity': {'S': entity_id},
-                    'prediction_type': {'S': insight_data['prediction_type']},
-                    'risk_score': {'N': str(insight_data['risk_score'])},
-                    'explanation': {'S': insight_data['explanation']},
-                    'recommendations': {'L': recs_list},
-                    'model_used': {'S': MODEL_VERSION},
-                    'confidence': {'N': str(insight_data['confidence'])},
-                    'ttl': {'N': str(ttl)}
-                }
-            )
-            print(f"✅ Created insight: {insight_data['prediction_type']} for {entity_id} (risk: {insight_data['risk_score']})")
+            while True:
+                response = dynamodb_client.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems') or {}
+                unprocessed = len(request_items.get(TABLE_NAME, []))
+
+                if not unprocessed:
+                    written += len(chunk)
+                    break
+
+                attempt += 1
+                if attempt > BATCH_WRITE_MAX_RETRIES:
+                    written += len(chunk) - unprocessed
+                    print(f"❌ Giving up on {unprocessed} unprocessed insight writes after {BATCH_WRITE_MAX_RETRIES} retries")
+                    break
+
+                # Full jitter: sleep a random fraction of the exponential backoff window
+                time.sleep(random.uniform(0, BATCH_WRITE_BASE_BACKOFF_S * (2 ** attempt)))
 
         except Exception as e:
-            print(f"❌ Failed to create {insight_data['prediction_type']} insight for {entity_id}: {e}")
+            print(f"❌ Failed to write batch of {len(chunk)} insights: {e}")
+
+    print(f"✅ Created {written}/{len(insight_items)} insights")
+
+# Fixed-point formats for prediction attributes; format() rounds the exact binary
+# value half-even, so the stored number matches round(x, 4) / round(x, 2)
+PROBABILITY_FORMAT = '.4f'
+SCORE_FORMAT = '.2f'
+
+# Prediction update shared by every entity write (built once, never mutated)
+PREDICTION_UPDATE_EXPRESSION = (
+    'SET churn_risk_14d = :c14, '
+    'churn_risk_30d = :c30, '
+    'first_session_success_prob = :fss, '
+    'session_velocity = :sv, '
+    'health_score = :hs, '
+    '#seg = :seg, '
+    'model_version = :mv, '
+    'prediction_timestamp = :pts, '
+    'recommendations = :rec, '
+    'feature_hash = :fh'
+)
+PREDICTION_ATTRIBUTE_NAMES = {'#seg': 'segment'}
+
+def to_number(value: float, fmt: str = PROBABILITY_FORMAT) -> Dict[str, str]:
+    """Format a float as a rounded DynamoDB number attribute in one C-level call (no Decimal)"""
+    return {'N': format(value, fmt)}
+
+def update_entity_predictions(
+    entity_id: str,
+    entity_type: str,
+    metrics: Dict[str, Any],
+    predictions: Optional[Dict[str, float]] = None,
+    pending_insights: Optional[List[Dict[str, Any]]] = None,
+    now: Optional[datetime] = None,
+    segment: Optional[str] = None,
+    raw: Optional[Tuple[float, ...]] = None,
+    feature_hash: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Process single entity (student or tutor) and update DynamoDB with predictions.
+
+    When predictions are not supplied (single-entity invocation), the endpoint is
+    called for this entity alone; batch callers pass predictions from one
+    multi-row invocation instead. Likewise, insight items are appended to
+    pending_insights for the caller to batch-write when it is given, and
+    written immediately otherwise. Batch callers also pass the segment from
+    classify_segments, the entity's raw-metrics row from raw_metric_rows and the
+    feature_hash stored for skipping unchanged entities on later runs.
+
+    The update only applies to an existing record; when there is none,
+    ConditionalCheckFailedException is raised for the caller to handle.
+    """
+    now = now or datetime.utcnow()
 
-def update_entity_predictions(entity_id: str, entity_type: str, metrics: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    """Process single entity (student or tutor) and update DynamoDB with predictions"""
     try:
-        # Engineer features based on entity type
-        features = engineer_features(metrics, entity_type)
-
-        # Get ML predictions from SageMaker
-        predictions = invoke_sagemaker(features)
+        if predictions is None or raw is None:
+            # Single-entity path: extract the raw metrics once for features and recommendations
+            spec, _ = RAW_FEATURE_SPECS.get(entity_type, RAW_FEATURE_SPECS['student'])
+            raw_matrix = extract_raw_features([metrics], spec)
+            raw = raw_metric_rows(raw_matrix, entity_type)[0]
+
+            if predictions is None:
+                # Engineer features and get ML predictions from SageMaker
+                features = engineer_features_batch([metrics], entity_type, raw=raw_matrix)
+                predictions = invoke_sagemaker(features)[0]
+                if predictions != DEFAULT_PREDICTIONS:
+                    feature_hash = feature_hashes(features)[0]
 
         # Classify segment based on entity type
-        segment = classify_segment(predictions, entity_type)
+        if segment is None:
+            segment = classify_segment(predictions, entity_type)
 
         # Generate recommendations based on entity type
-        recommendations = generate_recommendations(metrics, predictions, segment, entity_type)
+        recommendations = generate_recommendations(raw, predictions, segment, entity_type)
 
-        # Update DynamoDB with predictions
-        table.update_item(
+        # Update DynamoDB with predictions (low-level client: typed values skip the resource serializer)
+        dynamodb_client.update_item(
+            TableName=TABLE_NAME,
             Key={
-                'entity_id': entity_id,
-                'entity_type': entity_type
-            },
-            UpdateExpression='''
-                SET churn_risk_14d = :c14,
-                    churn_risk_30d = :c30,
-                    first_session_success_prob = :fss,
-                    session_velocity = :sv,
-                    health_score = :hs,
-                    #seg = :seg,
-                    model_version = :mv,
-                    prediction_timestamp = :pts,
-                    recommendations = :rec
-            ''',
-            ExpressionAttributeNames={
-                '#seg': 'segment'
+                'entity_id': {'S': entity_id},
+                'entity_type': {'S': entity_type}
             },
+            UpdateExpression=PREDICTION_UPDATE_EXPRESSION,
+            ConditionExpression='attribute_exists(entity_id)',
+            ExpressionAttributeNames=PREDICTION_ATTRIBUTE_NAMES,
             ExpressionAttributeValues={
-                ':c14': Decimal(str(round(predictions['churn_risk_14d'], 4))),
-                ':c30': Decimal(str(round(predictions['churn_risk_30d'], 4))),
-                ':fss': Decimal(str(round(predictions['first_session_success'], 4))),
-                ':sv': Decimal(str(round(predictions['session_velocity'], 4))),
-                ':hs': Decimal(str(round(predictions['health_score'], 2))),
-                ':seg': segment,
-                ':mv': MODEL_VERSION,
-                ':pts': datetime.utcnow().isoformat(),
-                ':rec': recommendations
+                ':c14': to_number(predictions['churn_risk_14d']),
+                ':c30': to_number(predictions['churn_risk_30d']),
+                ':fss': to_number(predictions['first_session_success']),
+                ':sv': to_number(predictions['session_velocity']),
+                ':hs': to_number(predictions['health_score'], SCORE_FORMAT),
+                ':seg': {'S': segment},
+                ':mv': {'S': MODEL_VERSION},
+                ':pts': {'S': clock_strings(now)[0]},
+                ':rec': {'L': [{'S': rec} for rec in recommendations]},
+                ':fh': {'S': feature_hash or ''}
             }
         )
 
@@ -608,7 +933,11 @@ def update_entity_predictions(entity_id: str, entity_type: str, metrics: Dict[st
             print(f"✅ Updated student predictions for {entity_id}: segment={segment}, churn_14d={predictions['churn_risk_14d']:.2%}, health={predictions['health_score']:.1f}")
 
         # Create insight records from predictions
-        create_insights_from_predictions(entity_id, predictions, segment, recommendations, metrics)
+        insight_items = create_insights_from_predictions(entity_id, predictions, segment, recommendations, metrics, now)
+        if pending_insights is None:
+            write_insights(insight_items)
+        else:
+            pending_insights.extend(insight_items)
 
         return {
             'entity_id': entity_id,
@@ -617,122 +946,394 @@ def update_entity_predictions(entity_id: str, entity_type: str, metrics: Dict[st
             'recommendations': recommendations
         }
 
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        raise
     except Exception as e:
         print(f"❌ Error processing {entity_id}: {e}")
         return None
 
-def publish_cloudwatch_metrics(results: List[Dict[str, Any]]) -> None:
-    """Publish aggregated metrics to CloudWatch for monitoring and alerting"""
-    if not results:
-        return
+def publish_cloudwatch_metrics(aggregates: List[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+    """
+    Publish aggregated metrics to CloudWatch for monitoring and alerting
 
-    # Count customers by segment
-    segment_counts = {'thriving': 0, 'healthy': 0, 'at_risk': 0, 'churned': 0}
-    churn_risks = []
-    health_scores = []
+    Takes the running aggregates process_entity_type accumulates per entity type,
+    so no per-result pass is needed here.
+    """
+    processed = sum(aggregate['processed'] for aggregate in aggregates)
+    if not processed:
+        return
 
-    for result in results:
-        segment_counts[result['segment']] += 1
-        churn_risks.append(result['predictions']['churn_risk_14d'])
-        health_scores.append(result['predictions']['health_score'])
+    # Combine per-type counters; segments sharing a name (at_risk) add up across types
+    segment_counts = {}
+    for aggregate in aggregates:
+        for segment, count in aggregate['segments'].items():
+            segment_counts[segment] = segment_counts.get(segment, 0) + count
+    high_churn_count = sum(aggregate['high_churn_count'] for aggregate in aggregates)
+    reused = sum(aggregate.get('reused', 0) for aggregate in aggregates)
 
     # Calculate aggregates
-    high_churn_count = sum(1 for c in churn_risks if c > 0.7)
-    avg_churn_risk = np.mean(churn_risks) if churn_risks else 0
-    avg_health_score = np.mean(health_scores) if health_scores else 0
+    avg_churn_risk = sum(aggregate['churn_risk_sum'] for aggregate in aggregates) / processed
+    avg_health_score = sum(aggregate['health_score_sum'] for aggregate in aggregates) / processed
+
+    # Publish to CloudWatch (one request, one shared timestamp)
+    timestamp = now or datetime.utcnow()
+    metric_values = (
+        ('TotalCustomersProcessed', processed, 'Count'),
+        ('HighChurnRiskCount', high_churn_count, 'Count'),
+        ('PredictionsReused', reused, 'Count'),
+        ('AverageChurnRisk14d', avg_churn_risk, 'None'),
+        ('AverageHealthScore', avg_health_score, 'None'),
+        ('ThrivingCustomers', segment_counts.get('thriving', 0), 'Count'),
+        ('AtRiskCustomers', segment_counts.get('at_risk', 0), 'Count'),
+        ('ChurnedCustomers', segment_counts.get('churned', 0), 'Count'),
+    )
+    metric_data = [
+        {
+            'MetricName': name,
+            'Value': value,
+            'Unit': unit,
+            'Timestamp': timestamp,
+            'StorageResolution': 60
+        }
+        for name, value, unit in metric_values
+    ]
+
+    # Score distributions as pre-aggregated statistic sets (count/sum/min/max in one datapoint)
+    scored = [aggregate for aggregate in aggregates if aggregate.get('health_score_min') is not None]
+    if scored:
+        for name, key in (('ChurnRisk14d', 'churn_risk'), ('HealthScore', 'health_score')):
+            metric_data.append({
+                'MetricName': name,
+                'StatisticValues': {
+                    'SampleCount': float(sum(aggregate['processed'] for aggregate in scored)),
+                    'Sum': sum(aggregate[f'{key}_sum'] for aggregate in scored),
+                    'Minimum': min(aggregate[f'{key}_min'] for aggregate in scored),
+                    'Maximum': max(aggregate[f'{key}_max'] for aggregate in scored),
+                },
+                'Unit': 'None',
+                'Timestamp': timestamp,
+                'StorageResolution': 60
+            })
+
+    # Per-segment counts as one dimensioned metric, so CloudWatch can slice and sum them server-side
+    metric_data.extend(
+        {
+            'MetricName': 'CustomersBySegment',
+            'Dimensions': [
+                {'Name': 'EntityType', 'Value': aggregate.get('entity_type', 'student')},
+                {'Name': 'Segment', 'Value': segment},
+            ],
+            'Value': count,
+            'Unit': 'Count',
+            'Timestamp': timestamp,
+            'StorageResolution': 60
+        }
+        for aggregate in aggregates
+        for segment, count in aggregate['segments'].items()
+    )
 
-    # Publish to CloudWatch
     try:
         cloudwatch.put_metric_data(
             Namespace='IOpsDashboard/Predictions',
-            MetricData=[
-                {
-                    'MetricName': 'TotalCustomersProcessed',
-                    'Value': len(results),
-                    'Unit': 'Count',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'HighChurnRiskCount',
-                    'Value': high_churn_count,
-                    'Unit': 'Count',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'AverageChurnRisk14d',
-                    'Value': avg_churn_risk,
-                    'Unit': 'None',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'AverageHealthScore',
-                    'Value': avg_health_score,
-                    'Unit': 'None',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'ThrivingCustomers',
-                    'Value': segment_counts['thriving'],
-                    'Unit': 'Count',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'AtRiskCustomers',
-                    'Value': segment_counts['at_risk'],
-                    'Unit': 'Count',
-                    'Timestamp': datetime.utcnow()
-                },
-                {
-                    'MetricName': 'ChurnedCustomers',
-                    'Value': segment_counts['churned'],
-                    'Unit': 'Count',
-                    'Timestamp': datetime.utcnow()
-                }
-            ]
+            MetricData=metric_data
         )
-        print(f"📊 Published CloudWatch metrics: {len(results)} customers, {high_churn_count} high churn risk, avg health={avg_health_score:.1f}")
+        print(f"📊 Published CloudWatch metrics: {processed} customers, {high_churn_count} high churn risk, avg health={avg_health_score:.1f}")
 
     except Exception as e:
         print(f"⚠️ Error publishing CloudWatch metrics: {e}")
 
-def process_entity_type(entity_type: str) -> List[Dict[str, Any]]:
-    """Process all entities of a specific type (student or tutor)"""
+# Metrics read by recommendations and insights in addition to the feature columns
+AUX_METRIC_KEYS = (
+    'sessions_7d', 'ib_calls_14d', 'payment_success_rate_30d', 'tutor_consistency_score',
+    'utilization_rate', 'avg_rating', 'student_retention_rate', 'days_since_last_session',
+)
+
+# Stored prediction attributes read back to reuse an unchanged entity's last scoring
+STORED_PREDICTION_KEYS = (
+    'feature_hash', 'prediction_timestamp', 'first_session_success_prob', 'session_velocity',
+    'churn_risk_14d', 'churn_risk_30d', 'health_score', 'recommendations',
+)
+
+def build_query_projection(spec: Tuple[Tuple[str, float], ...]) -> Tuple[str, Dict[str, str]]:
+    """
+    ProjectionExpression covering only the attributes an entity page is read for.
+    Every name goes through a #pN placeholder so reserved words never break the query.
+    """
+    keys = ['entity_id', 'entity_type']
+    for key in [key for key, _ in spec] + list(AUX_METRIC_KEYS) + list(STORED_PREDICTION_KEYS):
+        if key not in keys:
+            keys.append(key)
+
+    names = {f'#p{i}': key for i, key in enumerate(keys)}
+    return ', '.join(names), names
+
+QUERY_PROJECTIONS = {
+    'student': build_query_projection(STUDENT_RAW_FEATURES),
+    'tutor': build_query_projection(TUTOR_RAW_FEATURES),
+}
+
+def feature_hashes(features: np.ndarray) -> List[str]:
+    """Per-row digest of the float32 feature bytes, salted with the model version"""
+    salt = MODEL_VERSION.encode()
+    return [hashlib.blake2b(salt + row.tobytes(), digest_size=8).hexdigest() for row in features]
+
+# feature_hash -> (monotonic time scored, predictions), most recently used last
+prediction_cache: 'OrderedDict[str, Tuple[float, Dict[str, float]]]' = OrderedDict()
+# Students and tutors score concurrently; the lock is never held across an endpoint call
+prediction_cache_lock = threading.Lock()
+
+def score_features(features: np.ndarray, hashes: List[str]) -> List[Dict[str, float]]:
+    """
+    invoke_sagemaker for rows of features, skipping the endpoint for rows whose hash is
+    in the in-container prediction cache or repeats an earlier row of the same call.
+
+    Rows that fall back to default predictions get their hash reset to '' in place so
+    the defaults are never cached or stored as a reusable scoring.
+    """
+    predictions: List[Optional[Dict[str, float]]] = [None] * len(hashes)
+    fresh_since = time.monotonic() - PREDICTION_MAX_AGE_SECONDS
+    pending: Dict[str, List[int]] = {}
+
+    with prediction_cache_lock:
+        for row, feature_hash in enumerate(hashes):
+            cached = prediction_cache.get(feature_hash)
+            if cached is not None and cached[0] >= fresh_since:
+                prediction_cache.move_to_end(feature_hash)
+                predictions[row] = cached[1]
+            else:
+                pending.setdefault(feature_hash, []).append(row)
+
+    if pending:
+        # One endpoint row per distinct feature vector
+        unique_rows = [rows[0] for rows in pending.values()]
+        scored_at = time.monotonic()
+
+        fresh = []
+        for rows, scored in zip(pending.values(), invoke_sagemaker(features[unique_rows])):
+            if scored == DEFAULT_PREDICTIONS:
+                for row in rows:
+                    predictions[row] = dict(scored)
+                    hashes[row] = ''
+                continue
+
+            for row in rows:
+                predictions[row] = scored
+            fresh.append((hashes[rows[0]], scored))
+
+        with prediction_cache_lock:
+            if PREDICTION_CACHE_SIZE > 0 and PREDICTION_MAX_AGE_SECONDS > 0:
+                for feature_hash, scored in fresh:
+                    prediction_cache[feature_hash] = (scored_at, scored)
+                    prediction_cache.move_to_end(feature_hash)
+
+            while len(prediction_cache) > PREDICTION_CACHE_SIZE:
+                prediction_cache.popitem(last=False)
+
+    return predictions
+
+def stored_predictions(item: Dict[str, Any], feature_hash: str, fresh_after: str) -> Optional[Dict[str, float]]:
+    """Last predictions stored on item when its features are unchanged and were scored after fresh_after"""
+    if item.get('feature_hash') != feature_hash or str(item.get('prediction_timestamp', '')) < fresh_after:
+        return None
+
+    try:
+        return {
+            'first_session_success': float(item['first_session_success_prob']),
+            'session_velocity': float(item['session_velocity']),
+            'churn_risk_14d': float(item['churn_risk_14d']),
+            'churn_risk_30d': float(item['churn_risk_30d']),
+            'health_score': float(item['health_score']),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def update_entity_with_insights(
+    item: Dict[str, Any],
+    predictions: Dict[str, float],
+    segment: str,
+    raw: Tuple[float, ...],
+    feature_hash: str,
+    now: datetime
+) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Thread-pool worker: update one entity and collect its insight items for the page write"""
+    insight_items = []
+    try:
+        result = update_entity_predictions(
+            item['entity_id'],
+            item['entity_type'],
+            item,
+            predictions,
+            insight_items,
+            now,
+            segment,
+            raw,
+            feature_hash
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        # Deleted since the scan read it
+        print(f"⚠️ Skipping {item['entity_id']}: record no longer exists")
+        return None, []
+    return result, insight_items
+
+def process_entity_type(
+    entity_type: str,
+    now: Optional[datetime] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Process all entities of a specific type (student or tutor)
+
+    Returns:
+        Per-entity results, and running aggregates over the successfully updated
+        entities: entity_type, processed, reused (unchanged entities that kept their stored
+        predictions), segments (counts), high_churn_count, churn_risk_sum,
+        health_score_sum, and churn_risk_min/max, health_score_min/max (None
+        when nothing was processed)
+    """
     print(f"Processing all {entity_type}s (batch size: {BATCH_SIZE})")
 
+    now = now or datetime.utcnow()
     results = []
-    last_evaluated_key = None
+    segment_names = SEGMENT_NAMES.get(entity_type, SEGMENT_NAMES['student'])
+    raw_spec, _ = RAW_FEATURE_SPECS.get(entity_type, RAW_FEATURE_SPECS['student'])
+    segment_totals = np.zeros(len(segment_names), dtype=np.int64)
+    high_churn_count = 0
+    churn_risk_sum = 0.0
+    health_score_sum = 0.0
+    churn_risk_range = [None, None]
+    health_score_range = [None, None]
+    reused = 0
+
+    # Predictions scored before this cutoff are re-scored even if features are unchanged
+    fresh_after = (now - timedelta(seconds=PREDICTION_MAX_AGE_SECONDS)).isoformat()
+    if PREDICTION_MAX_AGE_SECONDS <= 0:
+        fresh_after = '~'  # Sorts after every ISO timestamp: nothing is fresh
+
+    # Feature buffer reused across pages (pages never exceed BATCH_SIZE items)
+    feature_buffer = np.empty((BATCH_SIZE, FEATURE_COUNT), dtype=np.float32)
+
+    # Query entities from DynamoDB, projecting only feature and recommendation attributes
+    projection, projection_names = QUERY_PROJECTIONS.get(entity_type, QUERY_PROJECTIONS['student'])
+    query_params = {
+        'IndexName': 'EntityTypeIndex',
+        'KeyConditionExpression': 'entity_type = :type',
+        'ProjectionExpression': projection,
+        'ExpressionAttributeNames': projection_names,
+        'ExpressionAttributeValues': {':type': entity_type},
+        'Limit': BATCH_SIZE
+    }
+
+    response = table.query(**query_params)
 
     while True:
-        # Query entities from DynamoDB
-        query_params = {
-            'IndexName': 'EntityTypeIndex',
-            'KeyConditionExpression': 'entity_type = :type',
-            'ExpressionAttributeValues': {':type': entity_type},
-            'Limit': BATCH_SIZE
-        }
+        items = response['Items']
 
+        # Prefetch the next page so its query overlaps this page's inference and writes
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        next_page_future = None
         if last_evaluated_key:
-            query_params['ExclusiveStartKey'] = last_evaluated_key
-
-        response = table.query(**query_params)
-
-        # Process batch
-        for item in response['Items']:
-            result = update_entity_predictions(
-                item['entity_id'],
-                item['entity_type'],
-                item
+            next_page_future = entity_executor.submit(
+                table.query, **query_params, ExclusiveStartKey=last_evaluated_key
             )
 
-            if result:
-                results.append(result)
+        if items:
+            # Stack the page's features into an (N, 46) matrix
+            raw = extract_raw_features(items, raw_spec)
+            features = engineer_features_batch(items, entity_type, out=feature_buffer[:len(items)], raw=raw)
+
+            # Entities with unchanged features and recent predictions keep them; the rest of
+            # the page is re-scored, with one endpoint row per distinct uncached feature vector
+            hashes = feature_hashes(features)
+            batch_predictions = [stored_predictions(item, h, fresh_after) for item, h in zip(items, hashes)]
+            stale_rows = [row for row, predictions in enumerate(batch_predictions) if predictions is None]
+            if stale_rows:
+                stale_hashes = [hashes[row] for row in stale_rows]
+                for row, predictions in zip(stale_rows, score_features(features[stale_rows], stale_hashes)):
+                    batch_predictions[row] = predictions
+                for row, feature_hash in zip(stale_rows, stale_hashes):
+                    hashes[row] = feature_hash
+
+            churn_14d, churn_30d, health = prediction_columns(batch_predictions)
+            labels = classify_segment_columns(churn_14d, churn_30d, health, entity_type)
+            segments = [segment_names[label] for label in labels]
+            raw_rows = raw_metric_rows(raw, entity_type)
+
+            # Fan re-scored entities out to per-entity updates in parallel (I/O-bound);
+            # insights are batch-written per page
+            def update_row(row: int) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+                return update_entity_with_insights(
+                    items[row], batch_predictions[row], segments[row], raw_rows[row], hashes[row], now
+                )
+
+            updates = dict(zip(stale_rows, entity_executor.map(update_row, stale_rows)))
+            page_insights = []
+            succeeded = np.zeros(len(items), dtype=bool)
+            for row, item in enumerate(items):
+                if row in updates:
+                    result, insight_items = updates[row]
+                    page_insights.extend(insight_items)
+                else:
+                    # Unchanged entity: nothing to write, report its stored scoring
+                    result = {
+                        'entity_id': item['entity_id'],
+                        'segment': segments[row],
+                        'predictions': batch_predictions[row],
+                        'recommendations': list(item.get('recommendations', []))
+                    }
+
+                if result:
+                    results.append(result)
+                    succeeded[row] = True
+
+            reused += len(items) - len(stale_rows)
+
+            write_insights(page_insights)
+            # Running aggregates for CloudWatch, over the rows that were written
+            segment_totals += np.bincount(labels[succeeded], minlength=len(segment_names))
+            high_churn_count += int(np.count_nonzero(churn_14d[succeeded] > SEVERE_CHURN_RISK))
+            churn_risk_sum += float(churn_14d[succeeded].sum())
+            health_score_sum += float(health[succeeded].sum())
+            if succeeded.any():
+                for value_range, values in ((churn_risk_range, churn_14d[succeeded]), (health_score_range, health[succeeded])):
+                    low, high = float(values.min()), float(values.max())
+                    value_range[0] = low if value_range[0] is None else min(value_range[0], low)
+                    value_range[1] = high if value_range[1] is None else max(value_range[1], high)
 
         # Check if more pages exist
-        last_evaluated_key = response.get('LastEvaluatedKey')
-        if not last_evaluated_key:
+        if next_page_future is None:
             break
+        response = next_page_future.result()
+
+    if reused:
+        print(f"♻️ Reused stored predictions for {reused} unchanged {entity_type}s")
+
+    aggregates = {
+        'entity_type': entity_type,
+        'processed': len(results),
+        'reused': reused,
+        'segments': {name: int(count) for name, count in zip(segment_names, segment_totals)},
+        'high_churn_count': high_churn_count,
+        'churn_risk_sum': churn_risk_sum,
+        'health_score_sum': health_score_sum,
+        'churn_risk_min': churn_risk_range[0],
+        'churn_risk_max': churn_risk_range[1],
+        'health_score_min': health_score_range[0],
+        'health_score_max': health_score_range[1],
+    }
+    return results, aggregates
 
-    return results
+def warm_connections() -> None:
+    """
+    Resolve credentials and open a TLS connection to DynamoDB during init.
+    DescribeTable is covered by the table's read/write grant and is cheap;
+    failures only cost the warmup, never the invocation.
+    """
+    try:
+        dynamodb_client.describe_table(TableName=TABLE_NAME)
+    except Exception as e:
+        print(f"⚠️ Connection warmup skipped: {e}")
+
+if WARM_CONNECTIONS:
+    warm_connections()
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
@@ -740,13 +1341,19 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
     Triggered by:
     - EventBridge schedule (every minute)
-    - Manual invocation for specific entities
+    - Manual invocation for specific entities:
+      {"entity_id": "...", "entity_type": "student" | "tutor", "metrics": {...}}
+      "metrics" is optional; when present it is used as the entity's record and
+      the DynamoDB get_item round-trip is skipped.
 
     Returns:
         Summary of processed students and tutors with predictions
     """
     print(f"🚀 Starting AI prediction refresh (model: {MODEL_VERSION}, endpoint: {ENDPOINT_NAME})")
 
+    # One clock reading per invocation, shared by every prediction, insight and metric
+    now = datetime.utcnow()
+
     # Check if invoked for specific entity
     entity_id = event.get('entity_id') or event.get('customer_id')
     entity_type = event.get('entity_type', 'student')
@@ -754,17 +1361,29 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     if entity_id:
         # Process single entity
         print(f"Processing single {entity_type}: {entity_id}")
-        response = table.get_item(
-            Key={'entity_id': entity_id, 'entity_type': entity_type}
-        )
 
-        if 'Item' not in response:
-            return {
-                'statusCode': 404,
-                'body': json.dumps({'error': f'{entity_type.capitalize()} {entity_id} not found'})
-            }
+        not_found = {
+            'statusCode': 404,
+            'body': json.dumps({'error': f'{entity_type.capitalize()} {entity_id} not found'})
+        }
+
+        # Caller-supplied metrics save a read; otherwise load the entity record
+        metrics = event.get('metrics')
+        if metrics is None:
+            response = table.get_item(
+                Key={'entity_id': entity_id, 'entity_type': entity_type}
+            )
+
+            if 'Item' not in response:
+                return not_found
 
-        result = update_entity_predictions(entity_id, entity_type, response['Item'])
+            metrics = response['Item']
+
+        try:
+            result = update_entity_predictions(entity_id, entity_type, metrics, now=now)
+        except dynamodb_client.exceptions.ConditionalCheckFailedException:
+            # Inline metrics for an entity with no record: nothing to update
+            return not_found
 
         return {
             'statusCode': 200,
@@ -774,12 +1393,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }, default=str)
         }
 
-    # Process both students and tutors
-    student_results = process_entity_type('student')
-    tutor_results = process_entity_type('tutor')
+    # Process students and tutors concurrently (both are I/O-bound on DynamoDB and the endpoint)
+    student_future = entity_type_executor.submit(process_entity_type, 'student', now)
+    tutor_future = entity_type_executor.submit(process_entity_type, 'tutor', now)
+    student_results, student_aggregates = student_future.result()
+    tutor_results, tutor_aggregates = tutor_future.result()
 
     # Publish aggregated metrics to CloudWatch
-    publish_cloudwatch_metrics(student_results + tutor_results)
+    publish_cloudwatch_metrics([student_aggregates, tutor_aggregates], now)
 
     # Summary
     summary = {
@@ -787,21 +1408,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'students_processed': len(student_results),
         'tutors_processed': len(tutor_results),
         'total_processed': len(student_results) + len(tutor_results),
-        'student_segments': {
-            'thriving': sum(1 for r in student_results if r['segment'] == 'thriving'),
-            'healthy': sum(1 for r in student_results if r['segment'] == 'healthy'),
-            'at_risk': sum(1 for r in student_results if r['segment'] == 'at_risk'),
-            'churned': sum(1 for r in student_results if r['segment'] == 'churned'),
-        },
-        'tutor_segments': {
-            'star': sum(1 for r in tutor_results if r['segment'] == 'star'),
-            'healthy': sum(1 for r in tutor_results if r['segment'] == 'healthy'),
-            'at_risk': sum(1 for r in tutor_results if r['segment'] == 'at_risk'),
-            'churning': sum(1 for r in tutor_results if r['segment'] == 'churning'),
-        },
+        'student_segments': student_aggregates['segments'],
+        'tutor_segments': tutor_aggregates['segments'],
         'model_version': MODEL_VERSION,
         'endpoint': ENDPOINT_NAME,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': now.isoformat()
     }
 
     print(f"✅ Completed prediction refresh: {len(student_results)} students, {len(tutor_results)} tutors")
@@ -1,57 +1,114 @@
 import json
+import logging
 import os
 import base64
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import boto3
+import numpy as np
+from botocore.config import Config
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library codec when orjson is not installed (e.g. local tooling)
+    orjson = None
+
+# Logging configured once per container; per-record traces are DEBUG so they cost
+# nothing at the default INFO level
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Keep-alive connection pools reused across warm invocations; adaptive retries
+# back off client-side when the table or bus throttles
+client_config = Config(
+    max_pool_connections=64,
+    retries={'mode': 'adaptive', 'total_max_attempts': 3},
+    tcp_keepalive=True
+)
+
 # Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
-eventbridge = boto3.client('events', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+dynamodb = boto3.resource('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'), config=client_config)
+eventbridge = boto3.client('events', region_name=os.environ.get('AWS_REGION', 'us-east-1'), config=client_config)
 
 # Configuration
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
 EVENT_BUS_NAME = os.environ.get('EVENT_BUS_NAME', 'default')
 
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_BACKOFF_S = 0.05
+
+# PutEvents accepts at most 10 entries per request
+PUT_EVENTS_MAX_ENTRIES = 10
+PUT_EVENTS_MAX_RETRIES = 3
+ALERT_WORKERS = int(os.environ.get('ALERT_WORKERS', '4'))
+# Entry fields every alert shares; each entry adds its DetailType and Detail
+ALERT_ENTRY_FIELDS = {'Source': 'iops-dashboard.processor', 'EventBusName': EVENT_BUS_NAME}
+
+# Worker pool for PutEvents chunks, kept for the container's lifetime so warm
+# invocations reuse its threads
+alert_executor = ThreadPoolExecutor(max_workers=ALERT_WORKERS)
+
+# Entity types as small integer codes for vectorized anomaly checks
+ENTITY_TYPE_CODES = {'student': 1, 'tutor': 2}
+ANOMALY_ROW_DTYPE = np.dtype([('etype', 'u1'), ('ib14', 'i8'), ('h', 'f8'), ('high_demand', '?')])
+
 # Get DynamoDB table
 table = dynamodb.Table(TABLE_NAME)
 
-# Type definitions
+# Type definitions (slotted: one per Kinesis record, no per-instance __dict__)
+@dataclass(slots=True, frozen=True)
 class IncomingEvent:
-    def __init__(self, data: Dict[str, Any]):
-        self.event_type = data['event_type']
-        self.timestamp = data.get('timestamp', datetime.utcnow().isoformat())
-        self.payload = data['payload']
-        self.ingested_at = data.get('ingested_at', datetime.utcnow().isoformat())
+    event_type: str
+    timestamp: str
+    payload: Dict[str, Any]
+    ingested_at: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], now: Optional[str] = None) -> 'IncomingEvent':
+        """Event from a decoded record; now (the invocation's ISO timestamp) fills in missing timestamps"""
+        now = now or datetime.utcnow().isoformat()
+        return cls(
+            event_type=data['event_type'],
+            timestamp=data.get('timestamp', now),
+            payload=data['payload'],
+            ingested_at=data.get('ingested_at', now),
+        )
 
+@dataclass(slots=True)
 class AggregatedMetrics:
-    def __init__(self, entity_id: str, entity_type: str):
-        self.entity_id = entity_id
-        self.entity_type = entity_type
-        self.sessions_7d = 0
-        self.sessions_14d = 0
-        self.sessions_30d = 0
-        self.ib_calls_7d = 0
-        self.ib_calls_14d = 0
-        self.avg_rating = 0.0
-        self.health_score = 100.0
-        self.last_updated = datetime.utcnow().isoformat()
+    entity_id: str
+    entity_type: str
+    sessions_7d: int = 0
+    sessions_14d: int = 0
+    sessions_30d: int = 0
+    ib_calls_7d: int = 0
+    ib_calls_14d: int = 0
+    avg_rating: float = 0.0
+    health_score: float = 100.0
+    last_updated: str = field(default_factory=lambda: datetime.utcnow().isoformat())
 
 # Decode Kinesis record
-def decode_record(record: Dict[str, Any]) -> Optional[IncomingEvent]:
-    """Decode base64 Kinesis record data"""
+def decode_record(record: Dict[str, Any], now: Optional[str] = None) -> Optional[IncomingEvent]:
+    """Decode base64 Kinesis record data; JSON numbers with a fraction become Decimal for DynamoDB"""
     try:
         data = base64.b64decode(record['kinesis']['data']).decode('utf-8')
-        parsed = json.loads(data)
-        return IncomingEvent(parsed)
+        parsed = json.loads(data, parse_float=Decimal)
+        return IncomingEvent.from_dict(parsed, now)
     except Exception as error:
-        print(f"Failed to decode record: {error}")
+        logger.warning("Failed to decode record: %s", error)
         return None
 
-# Get or create aggregated metrics for an entity
-def get_metrics(entity_id: str, entity_type: str) -> Dict[str, Any]:
-    """Get existing metrics or return default"""
+def fetch_metrics(entity_id: str, entity_type: str) -> Optional[Dict[str, Any]]:
+    """Stored metrics of an entity, or None when it has no item (or the read fails)"""
     try:
         response = table.get_item(
             Key={
@@ -64,9 +121,12 @@ def get_metrics(entity_id: str, entity_type: str) -> Dict[str, Any]:
             return response['Item']
 
     except Exception as error:
-        print(f"Error fetching metrics: {error}")
+        logger.error("Error fetching metrics: %s", error)
+
+    return None
 
-    # Return default metrics for new entities
+def default_metrics(entity_id: str, entity_type: str, now: Optional[str] = None) -> Dict[str, Any]:
+    """Starting metrics for an entity that has no item yet"""
     return {
         'entity_id': entity_id,
         'entity_type': entity_type,
@@ -77,19 +137,236 @@ def get_metrics(entity_id: str, entity_type: str) -> Dict[str, Any]:
         'ib_calls_14d': 0,
         'avg_rating': Decimal('0'),
         'health_score': Decimal('100'),
-        'last_updated': datetime.utcnow().isoformat(),
+        'last_updated': now or datetime.utcnow().isoformat(),
     }
 
-# Convert float to Decimal for DynamoDB
-def to_decimal(value: Any) -> Decimal:
-    """Convert float to Decimal for DynamoDB storage"""
-    if isinstance(value, float):
-        return Decimal(str(value))
-    return value
+def entity_keys(event: IncomingEvent) -> List[Tuple[str, str]]:
+    """(entity_id, entity_type) of every entity whose metrics an event reads or updates"""
+    keys = []
+    if event.payload.get('student_id'):
+        keys.append((event.payload['student_id'], 'student'))
+    if event.payload.get('tutor_id'):
+        keys.append((event.payload['tutor_id'], 'tutor'))
+    if event.event_type == 'supply_demand_update' and event.payload.get('subject'):
+        # Read only for its stored shard position, so a replayed snapshot is skipped
+        keys.append((event.payload['subject'], 'subject'))
+    return keys
+
+class MetricsBatch:
+    """
+    Entity metrics for one Kinesis batch: every touched entity is read once with
+    BatchGetItem and records update the in-memory items. Changes are recorded as
+    counter increments and attribute assignments, and flush() writes each changed
+    entity with one UpdateItem (ADD for counters, so concurrent shards never lose
+    increments to a read-modify-write).
+
+    With a shard id, each entity item also stores the sequence number of the last
+    record from that shard applied to it. Records at or below it are skipped, and
+    the write is conditional on the stored value not having moved since the read,
+    so a retried batch never counts a record twice. This relies on one batch per
+    shard being in flight at a time (the default ParallelizationFactor of 1).
+    """
+    def __init__(self, now: Optional[str] = None, shard_id: Optional[str] = None):
+        # One ISO timestamp for every last_updated written by the batch
+        self.now = now or datetime.utcnow().isoformat()
+        self.items: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # key -> (counter increments, attribute assignments)
+        self.dirty: Dict[Tuple[str, str], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        # Entities with no stored item; flush fills in their untouched default attributes
+        self.created: set = set()
+        self.sequence_attribute = f'sequence_{shard_id}' if shard_id else None
+        # Sequence number of the record being applied; set by the caller per record
+        self.sequence_number: Optional[str] = None
+        # key -> sequence number stored on the item when it was read (None if never written from this shard)
+        self.applied: Dict[Tuple[str, str], Optional[str]] = {}
+        # key -> sequence numbers of the records that changed it in this batch
+        self.records: Dict[Tuple[str, str], List[str]] = {}
+        # Sequence numbers of records that changed at least one entity / were skipped for one
+        self.changed: set = set()
+        self.skipped: set = set()
+
+    def _load(self, key: Tuple[str, str], item: Dict[str, Any]) -> None:
+        """Hold an entity's metrics and the shard position already applied to them"""
+        self.items[key] = item
+        if self.sequence_attribute:
+            self.applied[key] = item.get(self.sequence_attribute)
+
+    def _record(self, key: Tuple[str, str]) -> None:
+        """Note that the current record changed an entity"""
+        if self.sequence_number is not None:
+            self.changed.add(self.sequence_number)
+            sequences = self.records.setdefault(key, [])
+            if not sequences or sequences[-1] != self.sequence_number:
+                sequences.append(self.sequence_number)
+
+    def _changes(self, key: Tuple[str, str]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Pending (increments, assignments) of an entity, or None if the current record was already applied to it"""
+        applied = self.applied.get(key)
+        if self.sequence_number is not None and applied is not None and int(self.sequence_number) <= int(applied):
+            self.skipped.add(self.sequence_number)
+            return None
+        self._record(key)
+        return self.dirty.setdefault(key, ({}, {}))
+
+    def already_applied(self) -> bool:
+        """Whether every entity the current record touches had already applied it (a replayed record)"""
+        return self.sequence_number in self.skipped and self.sequence_number not in self.changed
+
+    def prefetch(self, keys: List[Tuple[str, str]]) -> None:
+        """Load the metrics of every key not already held, 100 keys per BatchGetItem"""
+        pending = [key for key in dict.fromkeys(keys) if key not in self.items]
+
+        for start in range(0, len(pending), BATCH_GET_MAX_KEYS):
+            chunk = pending[start:start + BATCH_GET_MAX_KEYS]
+            request = {TABLE_NAME: {'Keys': [{'entity_id': entity_id, 'entity_type': entity_type} for entity_id, entity_type in chunk]}}
+
+            try:
+                for attempt in range(BATCH_GET_MAX_RETRIES):
+                    response = dynamodb.batch_get_item(RequestItems=request)
+                    for item in response.get('Responses', {}).get(TABLE_NAME, []):
+                        self._load((item['entity_id'], item['entity_type']), item)
+
+                    request = response.get('UnprocessedKeys') or {}
+                    if not request:
+                        break
+                    # Throttled keys: back off with jitter before resubmitting
+                    time.sleep(random.uniform(0, BATCH_GET_BASE_BACKOFF_S * (2 ** attempt)))
+            except Exception as error:
+                logger.error("Error prefetching metrics: %s", error)
+                continue
+
+            if request:
+                # Still unprocessed after retries: get() reads these one at a time
+                continue
+
+            # Keys the table did not return are new entities
+            for key in chunk:
+                if key not in self.items:
+                    self._load(key, default_metrics(*key, self.now))
+                    self.created.add(key)
+
+    def get(self, entity_id: str, entity_type: str) -> Dict[str, Any]:
+        """Current metrics of an entity, including updates made earlier in the batch"""
+        key = (entity_id, entity_type)
+        if key not in self.items:
+            item = fetch_metrics(entity_id, entity_type)
+            if item is None:
+                item = default_metrics(entity_id, entity_type, self.now)
+                self.created.add(key)
+            self._load(key, item)
+        return self.items[key]
+
+    def add(self, item: Dict[str, Any], attribute: str, amount: int = 1) -> None:
+        """Increment a counter on item; written as an atomic ADD"""
+        changes = self._changes((item['entity_id'], item['entity_type']))
+        if changes is None:
+            return
+        increments, assignments = changes
+        item[attribute] = item.get(attribute, 0) + amount
+        if attribute in assignments:
+            # Already overwritten in this batch: the assignment carries the final value
+            assignments[attribute] = item[attribute]
+        else:
+            increments[attribute] = increments.get(attribute, 0) + amount
+
+    def set(self, item: Dict[str, Any], attribute: str, value: Any) -> None:
+        """Assign an attribute on item; replaces any increments made earlier in the batch"""
+        changes = self._changes((item['entity_id'], item['entity_type']))
+        if changes is None:
+            return
+        increments, assignments = changes
+        item[attribute] = value
+        increments.pop(attribute, None)
+        assignments[attribute] = value
+
+    def put(self, item: Dict[str, Any]) -> None:
+        """Replace an item's attributes; it is written on flush"""
+        key = (item['entity_id'], item['entity_type'])
+        if self._changes(key) is None:
+            return
+        # A full snapshot: none of the entity defaults apply
+        self.created.discard(key)
+        self.items[key] = item
+        self.dirty[key] = ({}, {name: value for name, value in item.items() if name not in ('entity_id', 'entity_type')})
+
+    def flush(self) -> List[str]:
+        """Write every changed entity with one UpdateItem; returns the sequence numbers of records whose entities failed to write"""
+        failed: List[str] = []
+        if not self.dirty:
+            return failed
+
+        for (entity_id, entity_type), (increments, assignments) in self.dirty.items():
+            key = (entity_id, entity_type)
+            names = {}
+            values = {}
+            set_clauses = []
+            add_clauses = []
+
+            def placeholders(attribute: str, value: Any) -> Tuple[str, str]:
+                index = len(names)
+                names[f'#a{index}'] = attribute
+                values[f':v{index}'] = value
+                return f'#a{index}', f':v{index}'
+
+            for attribute, value in assignments.items():
+                set_clauses.append('%s = %s' % placeholders(attribute, value))
+            for attribute, amount in increments.items():
+                add_clauses.append('%s %s' % placeholders(attribute, amount))
+
+            if (entity_id, entity_type) in self.created:
+                # New entity: store the remaining defaults unless another writer got there first
+                for attribute, value in default_metrics(entity_id, entity_type, self.now).items():
+                    if attribute not in ('entity_id', 'entity_type') and attribute not in increments and attribute not in assignments:
+                        name, placeholder = placeholders(attribute, value)
+                        set_clauses.append(f'{name} = if_not_exists({name}, {placeholder})')
+
+            condition = {}
+            if key in self.applied and self.records.get(key):
+                # Advance the shard position; rejected if another invocation moved it since the read
+                name, placeholder = placeholders(self.sequence_attribute, self.records[key][-1])
+                set_clauses.append(f'{name} = {placeholder}')
+                if self.applied[key] is None:
+                    condition['ConditionExpression'] = f'attribute_not_exists({name})'
+                else:
+                    values[':applied'] = self.applied[key]
+                    condition['ConditionExpression'] = f'{name} = :applied'
+
+            update_expression = ' '.join(
+                f'{verb} {", ".join(clauses)}'
+                for verb, clauses in (('SET', set_clauses), ('ADD', add_clauses)) if clauses
+            )
+            try:
+                table.update_item(
+                    Key={'entity_id': entity_id, 'entity_type': entity_type},
+                    UpdateExpression=update_expression,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    **condition
+                )
+            except Exception as error:
+                logger.error("Error writing metrics for %s %s: %s", entity_type, entity_id, error)
+                failed.extend(self.records.get(key, []))
+
+        logger.info("Updated %d metric items", len(self.dirty))
+        self.dirty = {}
+        self.created = set()
+        self.records = {}
+        self.changed = set()
+        self.skipped = set()
+        return sorted(set(failed), key=int)
 
 # Update metrics based on event
-def update_metrics(event: IncomingEvent) -> None:
-    """Update aggregated metrics in DynamoDB"""
+def update_metrics(event: IncomingEvent, batch: Optional[MetricsBatch] = None) -> None:
+    """
+    Update aggregated metrics in DynamoDB. With a batch, the update is applied to the
+    batch's items and written by its flush; otherwise it is written immediately.
+    """
+    if batch is None:
+        batch = MetricsBatch()
+        update_metrics(event, batch)
+        batch.flush()
+        return
+
     event_type = event.event_type
     payload = event.payload
 
@@ -98,180 +375,291 @@ def update_metrics(event: IncomingEvent) -> None:
         tutor_id = payload.get('tutor_id')
 
         if student_id:
-            metrics = get_metrics(student_id, 'student')
-            metrics['sessions_7d'] = metrics.get('sessions_7d', 0) + 1
-            metrics['sessions_14d'] = metrics.get('sessions_14d', 0) + 1
-            metrics['sessions_30d'] = metrics.get('sessions_30d', 0) + 1
-            metrics['last_updated'] = datetime.utcnow().isoformat()
-
-            table.put_item(Item=metrics)
+            metrics = batch.get(student_id, 'student')
+            batch.add(metrics, 'sessions_7d')
+            batch.add(metrics, 'sessions_14d')
+            batch.add(metrics, 'sessions_30d')
+            batch.set(metrics, 'last_updated', batch.now)
 
         if tutor_id:
-            metrics = get_metrics(tutor_id, 'tutor')
-            metrics['sessions_7d'] = metrics.get('sessions_7d', 0) + 1
-            metrics['sessions_14d'] = metrics.get('sessions_14d', 0) + 1
-            metrics['sessions_30d'] = metrics.get('sessions_30d', 0) + 1
+            metrics = batch.get(tutor_id, 'tutor')
+            batch.add(metrics, 'sessions_7d')
+            batch.add(metrics, 'sessions_14d')
+            batch.add(metrics, 'sessions_30d')
 
             if event_type == 'session_completed' and 'tutor_rating' in payload:
-                # Update rolling average rating
+                # Update rolling average rating (DynamoDB expressions cannot multiply or
+                # divide, so the average is computed here and assigned). Stored values and
+                # decoded payloads are already Decimal, so it never goes through float.
                 total_sessions = int(metrics['sessions_30d'])  # Convert Decimal to int
-                current_avg = float(metrics.get('avg_rating', 0))
-                new_rating = float(payload['tutor_rating'])
-                metrics['avg_rating'] = to_decimal(
-                    ((current_avg * (total_sessions - 1)) + new_rating) / total_sessions
-                )
+                current_avg = Decimal(metrics.get('avg_rating', 0))
+                new_rating = Decimal(payload['tutor_rating'])
+                batch.set(metrics, 'avg_rating', ((current_avg * (total_sessions - 1)) + new_rating) / total_sessions)
 
-            metrics['last_updated'] = datetime.utcnow().isoformat()
-            table.put_item(Item=metrics)
+            batch.set(metrics, 'last_updated', batch.now)
 
     elif event_type == 'ib_call_logged':
         student_id = payload.get('student_id')
 
         if student_id:
-            metrics = get_metrics(student_id, 'student')
-            metrics['ib_calls_7d'] = metrics.get('ib_calls_7d', 0) + 1
-            metrics['ib_calls_14d'] = metrics.get('ib_calls_14d', 0) + 1
-            metrics['last_updated'] = datetime.utcnow().isoformat()
-
-            table.put_item(Item=metrics)
+            metrics = batch.get(student_id, 'student')
+            batch.add(metrics, 'ib_calls_7d')
+            batch.add(metrics, 'ib_calls_14d')
+            batch.set(metrics, 'last_updated', batch.now)
 
     elif event_type == 'customer_health_update':
         student_id = payload.get('student_id')
 
         if student_id and 'health_score' in payload:
-            metrics = get_metrics(student_id, 'student')
-            metrics['health_score'] = to_decimal(payload['health_score'])
-            metrics['sessions_7d'] = payload.get('sessions_last_7_days', metrics.get('sessions_7d', 0))
-            metrics['sessions_30d'] = payload.get('sessions_last_30_days', metrics.get('sessions_30d', 0))
-            metrics['ib_calls_14d'] = payload.get('ib_calls_last_14_days', metrics.get('ib_calls_14d', 0))
-            metrics['last_updated'] = datetime.utcnow().isoformat()
-
-            table.put_item(Item=metrics)
+            metrics = batch.get(student_id, 'student')
+            batch.set(metrics, 'health_score', payload['health_score'])
+            # Snapshot counts replace the counters only when the update carries them
+            for attribute, field in (
+                ('sessions_7d', 'sessions_last_7_days'),
+                ('sessions_30d', 'sessions_last_30_days'),
+                ('ib_calls_14d', 'ib_calls_last_14_days'),
+            ):
+                if field in payload:
+                    batch.set(metrics, attribute, payload[field])
+            batch.set(metrics, 'last_updated', batch.now)
 
     elif event_type == 'supply_demand_update':
         subject = payload.get('subject')
         region = payload.get('region')
 
         if subject:
-            table.put_item(Item={
+            batch.put({
                 'entity_id': subject,
                 'entity_type': 'subject',
                 'region': region,
                 'available_tutors': payload.get('available_tutors', 0),
                 'active_students': payload.get('active_students', 0),
-                'demand_score': to_decimal(payload.get('demand_score', 0)),
-                'supply_score': to_decimal(payload.get('supply_score', 0)),
+                'demand_score': payload.get('demand_score', 0),
+                'supply_score': payload.get('supply_score', 0),
                 'balance_status': payload.get('balance_status', 'unknown'),
-                'last_updated': datetime.utcnow().isoformat(),
+                'last_updated': batch.now,
             })
 
     else:
-        print(f"No metric update for event type: {event_type}")
+        logger.debug("No metric update for event type: %s", event_type)
 
 # Detect anomalies and trigger alerts
-def detect_anomalies(event: IncomingEvent, metrics: Optional[Dict[str, Any]] = None) -> None:
-    """Detect anomalies and send alerts to EventBridge"""
-    alerts = []
-
-    # Anomaly 1: High IB call frequency
-    if metrics and metrics.get('ib_calls_14d', 0) >= 3 and metrics.get('entity_type') == 'student':
-        alerts.append({
-            'alert_type': 'high_ib_call_frequency',
-            'severity': 'warning',
-            'entity_id': metrics['entity_id'],
-            'entity_type': metrics['entity_type'],
-            'details': {
-                'ib_calls_14d': int(metrics['ib_calls_14d']),
-                'health_score': float(metrics.get('health_score', 100)),
-            },
-            'message': f"Student {metrics['entity_id']} has {metrics['ib_calls_14d']} IB calls in 14 days",
-            'timestamp': datetime.utcnow().isoformat(),
-        })
-
-    # Anomaly 2: Low health score
-    if metrics and float(metrics.get('health_score', 100)) < 70 and metrics.get('entity_type') == 'student':
-        health_score = float(metrics['health_score'])
-        alerts.append({
-            'alert_type': 'low_health_score',
-            'severity': 'critical' if health_score < 50 else 'warning',
-            'entity_id': metrics['entity_id'],
-            'entity_type': metrics['entity_type'],
-            'details': {
-                'health_score': health_score,
-                'sessions_7d': int(metrics.get('sessions_7d', 0)),
-                'ib_calls_14d': int(metrics.get('ib_calls_14d', 0)),
-            },
-            'message': f"Student {metrics['entity_id']} has low health score: {health_score}",
-            'timestamp': datetime.utcnow().isoformat(),
-        })
-
-    # Anomaly 3: Supply/demand imbalance
-    if event.event_type == 'supply_demand_update':
-        balance_status = event.payload.get('balance_status')
-        subject = event.payload.get('subject')
-        demand_score = event.payload.get('demand_score', 0)
-        supply_score = event.payload.get('supply_score', 0)
-
-        if balance_status == 'high_demand':
-            alerts.append({
-                'alert_type': 'supply_demand_imbalance',
-                'severity': 'info',
-                'entity_id': subject,
-                'entity_type': 'subject',
-                'details': {
-                    'balance_status': balance_status,
-                    'demand_score': float(demand_score),
-                    'supply_score': float(supply_score),
-                },
-                'message': f"High demand detected for {subject} (Demand: {demand_score}, Supply: {supply_score})",
-                'timestamp': datetime.utcnow().isoformat(),
-            })
-
-    # Send alerts to EventBridge
-    if alerts:
-        entries = [
-            {
-                'Source': 'iops-dashboard.processor',
-                'DetailType': alert['alert_type'],
-                'Detail': json.dumps(alert),
-                'EventBusName': EVENT_BUS_NAME,
-            }
-            for alert in alerts
-        ]
-
-        eventbridge.put_events(Entries=entries)
-        print(f"Sent {len(alerts)} alerts to EventBridge")
+class AnomalyBatch:
+    """
+    Post-update snapshot of every processed event in a Kinesis batch. alerts() checks
+    the whole batch with one set of vectorized comparisons and builds alert dicts only
+    for the rows that matched.
+    """
+    def __init__(self, now: Optional[str] = None):
+        # One ISO timestamp shared by every alert of the batch
+        self.now = now or datetime.utcnow().isoformat()
+        self.events: List[IncomingEvent] = []
+        # Kinesis sequence number of each event (None outside a Kinesis batch)
+        self.sequence_numbers: List[Optional[str]] = []
+        # (entity_id, entity_type, ib_calls_14d, health_score, sessions_7d) per event, None without metrics
+        self.snapshots: List[Optional[Tuple[str, str, int, float, int]]] = []
+        self.rows: List[Tuple[int, int, float, bool]] = []
+
+    def add(self, event: IncomingEvent, metrics: Optional[Dict[str, Any]] = None, sequence_number: Optional[str] = None) -> None:
+        """Record an event with its entity's metrics as they are right now"""
+        snapshot = None
+        if metrics:
+            snapshot = (
+                metrics['entity_id'],
+                metrics.get('entity_type'),
+                int(metrics.get('ib_calls_14d', 0)),
+                float(metrics.get('health_score', 100)),
+                int(metrics.get('sessions_7d', 0)),
+            )
+        high_demand = event.event_type == 'supply_demand_update' and event.payload.get('balance_status') == 'high_demand'
+
+        self.events.append(event)
+        self.sequence_numbers.append(sequence_number)
+        self.snapshots.append(snapshot)
+        if snapshot:
+            self.rows.append((ENTITY_TYPE_CODES.get(snapshot[1], 0), snapshot[2], snapshot[3], high_demand))
+        else:
+            self.rows.append((0, 0, 100.0, high_demand))
+
+    def alerts(self, exclude: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Alerts for the batch, in event order; events whose sequence number is in exclude are left out"""
+        if not self.rows:
+            return []
+
+        rows = np.array(self.rows, dtype=ANOMALY_ROW_DTYPE)
+        is_student = rows['etype'] == ENTITY_TYPE_CODES['student']
+        # Anomaly 1: High IB call frequency
+        mask_ib = is_student & (rows['ib14'] >= 3)
+        # Anomaly 2: Low health score
+        mask_low = is_student & (rows['h'] < 70)
+        # Anomaly 3: Supply/demand imbalance
+        mask_demand = rows['high_demand']
+
+        alerts = []
+        for index in np.flatnonzero(mask_ib | mask_low | mask_demand).tolist():
+            if exclude and self.sequence_numbers[index] in exclude:
+                continue
+            event = self.events[index]
+
+            if mask_ib[index] or mask_low[index]:
+                entity_id, entity_type, ib_calls_14d, health_score, sessions_7d = self.snapshots[index]
+
+                if mask_ib[index]:
+                    alerts.append({
+                        'alert_type': 'high_ib_call_frequency',
+                        'severity': 'warning',
+                        'entity_id': entity_id,
+                        'entity_type': entity_type,
+                        'details': {
+                            'ib_calls_14d': ib_calls_14d,
+                            'health_score': health_score,
+                        },
+                        'message': f"Student {entity_id} has {ib_calls_14d} IB calls in 14 days",
+                        'timestamp': self.now,
+                    })
+
+                if mask_low[index]:
+                    alerts.append({
+                        'alert_type': 'low_health_score',
+                        'severity': 'critical' if health_score < 50 else 'warning',
+                        'entity_id': entity_id,
+                        'entity_type': entity_type,
+                        'details': {
+                            'health_score': health_score,
+                            'sessions_7d': sessions_7d,
+                            'ib_calls_14d': ib_calls_14d,
+                        },
+                        'message': f"Student {entity_id} has low health score: {health_score}",
+                        'timestamp': self.now,
+                    })
+
+            if mask_demand[index]:
+                subject = event.payload.get('subject')
+                demand_score = event.payload.get('demand_score', 0)
+                supply_score = event.payload.get('supply_score', 0)
+                alerts.append({
+                    'alert_type': 'supply_demand_imbalance',
+                    'severity': 'info',
+                    'entity_id': subject,
+                    'entity_type': 'subject',
+                    'details': {
+                        'balance_status': 'high_demand',
+                        'demand_score': float(demand_score),
+                        'supply_score': float(supply_score),
+                    },
+                    'message': f"High demand detected for {subject} (Demand: {demand_score}, Supply: {supply_score})",
+                    'timestamp': self.now,
+                })
+
+        return alerts
+
+def put_alert_entries(entries: List[Dict[str, Any]]) -> int:
+    """Send up to 10 PutEvents entries, resubmitting only the failed ones; returns how many never went through"""
+    for attempt in range(PUT_EVENTS_MAX_RETRIES):
+        response = eventbridge.put_events(Entries=entries)
+        if not response.get('FailedEntryCount'):
+            return 0
+
+        # Result entries line up with the request; failed ones carry an ErrorCode
+        entries = [entry for entry, result in zip(entries, response['Entries']) if result.get('ErrorCode')]
+        if attempt < PUT_EVENTS_MAX_RETRIES - 1:
+            time.sleep(random.uniform(0, BATCH_GET_BASE_BACKOFF_S * (2 ** attempt)))
+
+    return len(entries)
+
+def dumps_detail(alert: Dict[str, Any]) -> str:
+    """Alert as the JSON string PutEvents expects in Detail"""
+    if orjson is not None:
+        return orjson.dumps(alert, default=str).decode()
+    return json.dumps(alert, default=str)
+
+def send_alerts(alerts: List[Dict[str, Any]]) -> None:
+    """Send alerts to EventBridge, 10 entries per PutEvents request with the requests in parallel"""
+    if not alerts:
+        return
+
+    entries = [
+        {**ALERT_ENTRY_FIELDS, 'DetailType': alert['alert_type'], 'Detail': dumps_detail(alert)}
+        for alert in alerts
+    ]
+
+    chunks = [entries[start:start + PUT_EVENTS_MAX_ENTRIES] for start in range(0, len(entries), PUT_EVENTS_MAX_ENTRIES)]
+    failed = sum(alert_executor.map(put_alert_entries, chunks))
+
+    if failed:
+        logger.error("Failed to send %d of %d alerts to EventBridge", failed, len(alerts))
+    logger.info("Sent %d alerts to EventBridge", len(alerts) - failed)
 
 # Main Lambda handler
-def lambda_handler(event: Dict[str, Any], context: Any) -> None:
-    """Process Kinesis stream records"""
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Process Kinesis stream records. Records whose entities failed to write are
+    returned as batchItemFailures (ReportBatchItemFailures), so only they are retried.
+    """
     records = event.get('Records', [])
-    print(f"Processing {len(records)} records from Kinesis")
+    logger.info("Processing %d records from Kinesis", len(records))
+
+    # One clock reading for every timestamp the invocation writes
+    now = datetime.utcnow().isoformat()
 
+    incoming_events = []
+    sequence_numbers = []
     for record in records:
-        incoming_event = decode_record(record)
+        incoming_event = decode_record(record, now)
+        if incoming_event:
+            incoming_events.append(incoming_event)
+            sequence_numbers.append(record['kinesis'].get('sequenceNumber'))
 
-        if not incoming_event:
-            continue
+    # Every record of an invocation comes from one shard; eventID is "<shard id>:<sequence number>"
+    shard_id = records[0].get('eventID', '').split(':', 1)[0] if records else None
 
-        print(f"Processing event: {incoming_event.event_type}")
+    # Read every entity the batch touches up front (one BatchGetItem per 100 entities)
+    batch = MetricsBatch(now, shard_id)
+    batch.prefetch([key for incoming_event in incoming_events for key in entity_keys(incoming_event)])
+    anomalies = AnomalyBatch(now)
+
+    for sequence_number, incoming_event in zip(sequence_numbers, incoming_events):
+        logger.debug("Processing event: %s", incoming_event.event_type)
+        batch.sequence_number = sequence_number
 
         try:
             # Update metrics
-            update_metrics(incoming_event)
+            update_metrics(incoming_event, batch)
+            if batch.already_applied():
+                # Replayed after a partial failure: its metrics and alerts went out before
+                logger.debug("Skipping already applied record %s", sequence_number)
+                continue
 
-            # Get updated metrics for anomaly detection
+            # Get updated metrics for anomaly detection (already in the batch, no read)
             metrics = None
             if incoming_event.payload.get('student_id'):
-                metrics = get_metrics(incoming_event.payload['student_id'], 'student')
+                metrics = batch.get(incoming_event.payload['student_id'], 'student')
             elif incoming_event.payload.get('tutor_id'):
-                metrics = get_metrics(incoming_event.payload['tutor_id'], 'tutor')
+                metrics = batch.get(incoming_event.payload['tutor_id'], 'tutor')
 
-            # Detect anomalies
-            detect_anomalies(incoming_event, metrics)
+            # Snapshot for anomaly detection, which runs once over the whole batch
+            anomalies.add(incoming_event, metrics, sequence_number)
 
         except Exception as error:
-            print(f"Error processing event: {error}")
+            logger.error("Error processing event: %s", error)
             # Continue processing other records even if one fails
 
-    print('Batch processing complete')
+    # One write per changed entity; records of entities that failed are reported for retry,
+    # and the stored shard positions keep the retry from re-counting the ones that succeeded
+    failed = batch.flush()
+    if failed:
+        logger.error("Reporting %d records for retry after failed metric writes", len(failed))
+
+    # Records reported for retry alert when their retry saves the metrics
+    try:
+        send_alerts(anomalies.alerts(exclude=set(failed)))
+    except Exception as error:
+        logger.error("Error sending alerts: %s", error)
+
+    logger.info(
+        "Batch processing complete: %d events (%s)",
+        len(incoming_events),
+        ', '.join(f"{event_type}: {count}" for event_type, count in Counter(e.event_type for e in incoming_events).items())
+    )
+
+    return {'batchItemFailures': [{'itemIdentifier': sequence_number} for sequence_number in failed]}
@@ -1,14 +1,52 @@
 import json
 import os
 import random
-from datetime import datetime
-from typing import Dict, Any, List
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 
 # Configuration from environment variables
 INGEST_API_URL = os.environ['INGEST_API_URL']
 STREAM_COUNT = int(os.environ.get('STREAM_COUNT', '50'))
 EVENTS_PER_RUN = int(os.environ.get('EVENTS_PER_RUN', '10'))
+# Concurrent in-flight posts, and the overall send rate they share (events per second)
+SIM_CONCURRENCY = int(os.environ.get('SIM_CONCURRENCY', '16'))
+SIM_RATE_PER_SECOND = float(os.environ.get('SIM_RATE_PER_SECOND', '100'))
+
+# One keep-alive session per container so events reuse pooled TLS connections
+# instead of opening a new one per POST
+http = requests.Session()
+http.headers.update({'Content-Type': 'application/json'})
+http.mount('https://', HTTPAdapter(pool_connections=20, pool_maxsize=50))
+
+# Worker pool for posts, kept for the container's lifetime so warm invocations reuse its threads
+post_executor = ThreadPoolExecutor(max_workers=SIM_CONCURRENCY)
+
+class RateLimiter:
+    """Spaces calls from any thread at least 1/rate seconds apart (no limit when rate <= 0)"""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        """Block until this caller's send slot"""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+rate_limiter = RateLimiter(SIM_RATE_PER_SECOND)
 
 # Event types from PRD
 EVENT_TYPES = [
@@ -20,6 +58,35 @@ EVENT_TYPES = [
     'supply_demand_update',
 ]
 
+# Value pools for payload fields, built once per container
+SUBJECTS = (
+    'Mathematics',
+    'Physics',
+    'Chemistry',
+    'Biology',
+    'English',
+    'History',
+    'Computer Science',
+    'Spanish',
+    'French',
+)
+STUDENT_NUMBERS = range(1000, 10000)
+TUTOR_NUMBERS = range(100, 1000)
+SESSION_TYPES = ('one_on_one', 'group', 'instant_book')
+SCHEDULED_DURATIONS = (30, 60, 90)
+IB_CALL_REASONS = (
+    'scheduling_issue',
+    'technical_problem',
+    'tutor_concern',
+    'billing_question',
+    'general_inquiry',
+)
+PRIORITIES = ('low', 'medium', 'high')
+TIMEZONES = ('EST', 'CST', 'MST', 'PST')
+CHURN_RISKS = ('low', 'medium', 'high')
+REGIONS = ('northeast', 'southeast', 'midwest', 'west', 'southwest')
+BALANCE_STATUSES = ('balanced', 'high_demand', 'oversupplied')
+
 # Helper functions for generating realistic data
 def random_int(min_val: int, max_val: int) -> int:
     """Generate random integer between min and max (inclusive)"""
@@ -30,53 +97,68 @@ def random_choice(arr: List[Any]) -> Any:
     return random.choice(arr)
 
 def generate_student_id() -> str:
-    return f"stu_{random_int(1000, 9999)}"
+    return f"stu_{random_choice(STUDENT_NUMBERS)}"
 
 def generate_tutor_id() -> str:
-    return f"tut_{random_int(100, 999)}"
+    return f"tut_{random_choice(TUTOR_NUMBERS)}"
+
+def event_clock() -> Tuple[str, int]:
+    """ISO-8601 UTC timestamp ('Z' suffix) and epoch milliseconds from one clock reading"""
+    now = datetime.now(timezone.utc)
+    return now.replace(tzinfo=None).isoformat() + 'Z', int(now.timestamp() * 1000)
+
+def unique_suffix() -> str:
+    """Random id suffix; events of a batch share one timestamp, so the suffix alone keeps their ids apart"""
+    return uuid.uuid4().hex[:12]
 
-def generate_session_id() -> str:
-    return f"sess_{int(datetime.now().timestamp() * 1000)}_{random_int(1000, 9999)}"
+def generate_session_id(timestamp_ms: Optional[int] = None) -> str:
+    if timestamp_ms is None:
+        timestamp_ms = event_clock()[1]
+    return f"sess_{timestamp_ms}_{unique_suffix()}"
 
 def generate_subject() -> str:
-    return random_choice([
-        'Mathematics',
-        'Physics',
-        'Chemistry',
-        'Biology',
-        'English',
-        'History',
-        'Computer Science',
-        'Spanish',
-        'French',
-    ])
+    return random_choice(SUBJECTS)
 
 # Generate event-specific payloads
-def generate_payload(event_type: str) -> Dict[str, Any]:
-    """Generate realistic payload for each event type"""
+def generate_payload(
+    event_type: str,
+    clock: Optional[Tuple[str, int]] = None,
+    student_id: Optional[str] = None,
+    tutor_id: Optional[str] = None,
+    subjects: Optional[Tuple[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Generate realistic payload for each event type. clock is an event_clock() reading
+    shared by a batch of events; without one the clock is read for this event. Batches
+    also pass pre-drawn ids and subjects; any not given are drawn here.
+    """
+    timestamp_iso, timestamp_ms = clock or event_clock()
+    student_id = student_id or generate_student_id()
+    tutor_id = tutor_id or generate_tutor_id()
+    subjects = subjects or (generate_subject(), generate_subject())
     base_data = {
-        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'timestamp': timestamp_iso,
         'source': 'simulator',
     }
 
     if event_type == 'session_started':
         return {
             **base_data,
-            'session_id': generate_session_id(),
-            'student_id': generate_student_id(),
-            'tutor_id': generate_tutor_id(),
-            'subject': generate_subject(),
-            'session_type': random_choice(['one_on_one', 'group', 'instant_book']),
-            'scheduled_duration_minutes': random_choice([30, 60, 90]),
+            'session_id': generate_session_id(timestamp_ms),
+            'student_id': student_id,
+            'tutor_id': tutor_id,
+            'subject': subjects[0],
+            'session_type': random_choice(SESSION_TYPES),
+            'scheduled_duration_minutes': random_choice(SCHEDULED_DURATIONS),
         }
 
     elif event_type == 'session_completed':
         return {
             **base_data,
-            'session_id': generate_session_id(),
-            'student_id': generate_student_id(),
-            'tutor_id': generate_tutor_id(),
-            'subject': generate_subject(),
+            'session_id': generate_session_id(timestamp_ms),
+            'student_id': student_id,
+            'tutor_id': tutor_id,
+            'subject': subjects[0],
             'actual_duration_minutes': random_int(20, 95),
             'student_rating': random_int(3, 5),
             'tutor_rating': random_int(3, 5),
@@ -86,81 +168,102 @@ def generate_payload(event_type: str) -> Dict[str, Any]:
     elif event_type == 'ib_call_logged':
         return {
             **base_data,
-            'call_id': f"call_{int(datetime.now().timestamp() * 1000)}_{random_int(100, 999)}",
-            'student_id': generate_student_id(),
-            'reason': random_choice([
-                'scheduling_issue',
-                'technical_problem',
-                'tutor_concern',
-                'billing_question',
-                'general_inquiry',
-            ]),
+            'call_id': f"call_{timestamp_ms}_{unique_suffix()}",
+            'student_id': student_id,
+            'reason': random_choice(IB_CALL_REASONS),
             'duration_seconds': random_int(60, 600),
             'resolved': random.random() > 0.3,  # 70% resolution rate
-            'priority': random_choice(['low', 'medium', 'high']),
+            'priority': random_choice(PRIORITIES),
         }
 
     elif event_type == 'tutor_availability_updated':
         return {
             **base_data,
-            'tutor_id': generate_tutor_id(),
+            'tutor_id': tutor_id,
             'available_hours_this_week': random_int(0, 40),
-            'subjects': [generate_subject(), generate_subject()],
-            'timezone': random_choice(['EST', 'CST', 'MST', 'PST']),
+            'subjects': list(subjects),
+            'timezone': random_choice(TIMEZONES),
             'accepts_instant_book': random.random() > 0.5,
         }
 
     elif event_type == 'customer_health_update':
         return {
             **base_data,
-            'student_id': generate_student_id(),
+            'student_id': student_id,
             'sessions_last_7_days': random_int(0, 10),
             'sessions_last_30_days': random_int(0, 40),
             'ib_calls_last_14_days': random_int(0, 5),
             'avg_session_rating': round(random.random() * 2 + 3, 2),  # 3.0-5.0
             'health_score': round(random.random() * 40 + 60, 2),  # 60-100
-            'churn_risk': random_choice(['low', 'medium', 'high']),
+            'churn_risk': random_choice(CHURN_RISKS),
         }
 
     elif event_type == 'supply_demand_update':
         return {
             **base_data,
-            'subject': generate_subject(),
-            'region': random_choice(['northeast', 'southeast', 'midwest', 'west', 'southwest']),
+            'subject': subjects[0],
+            'region': random_choice(REGIONS),
             'available_tutors': random_int(5, 100),
             'active_students': random_int(10, 500),
             'demand_score': round(random.random() * 50 + 50, 2),  # 50-100
             'supply_score': round(random.random() * 50 + 50, 2),  # 50-100
-            'balance_status': random_choice(['balanced', 'high_demand', 'oversupplied']),
+            'balance_status': random_choice(BALANCE_STATUSES),
         }
 
     return base_data
 
-# Generate and send a single event
-def generate_event() -> None:
-    """Generate and send a single random event"""
+# Generate and send events
+def build_event() -> Dict[str, Any]:
+    """Generate a single random event"""
     event_type = random_choice(EVENT_TYPES)
     payload = generate_payload(event_type)
 
-    event = {
+    return {
         'event_type': event_type,
         'payload': payload,
     }
 
+def post_event(event: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Send one event to the ingest API at the shared rate; returns (event_type, accepted).
+    Only failures are logged here; successes are summarised once per run.
+    """
+    event_type = event['event_type']
+    rate_limiter.wait()
+
     try:
-        response = requests.post(
-            INGEST_API_URL,
-            json=event,
-            headers={'Content-Type': 'application/json'},
-            timeout=5
-        )
+        response = http.post(INGEST_API_URL, json=event, timeout=5)
         response.raise_for_status()
-
-        result = response.json()
-        print(f"Sent {event_type}: {result.get('sequenceNumber', 'unknown')}")
+        return event_type, True
 
     except requests.exceptions.RequestException as error:
         print(f"Failed to send {event_type}: {str(error)}")
+        return event_type, False
+
+def generate_batch(count: int) -> List[Dict[str, Any]]:
+    """
+    Generate count random events. Event types, ids and subjects are each drawn with one
+    random.choices call for the whole batch, and the clock is read once.
+    """
+    clock = event_clock()
+    event_types = random.choices(EVENT_TYPES, k=count)
+    student_ids = [f"stu_{number}" for number in random.choices(STUDENT_NUMBERS, k=count)]
+    tutor_ids = [f"tut_{number}" for number in random.choices(TUTOR_NUMBERS, k=count)]
+    subjects = random.choices(SUBJECTS, k=2 * count)
+
+    return [
+        {
+            'event_type': event_type,
+            'payload': generate_payload(
+                event_type, clock, student_ids[i], tutor_ids[i], (subjects[2 * i], subjects[2 * i + 1])
+            ),
+        }
+        for i, event_type in enumerate(event_types)
+    ]
+
+def generate_event() -> None:
+    """Generate and send a single random event"""
+    post_event(build_event())
 
 # Main Lambda handler
 def lambda_handler(event: Dict[str, Any], context: Any) -> None:
@@ -171,15 +274,16 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> None:
     total_events = STREAM_COUNT * EVENTS_PER_RUN
     print(f"Generating {total_events} total events...")
 
-    # Generate events with controlled pacing
-    events_sent = 0
-    for i in range(total_events):
-        generate_event()
-        events_sent += 1
-
-        # Add small delay every 10 events to avoid overwhelming the API
-        if (i + 1) % 10 == 0:
-            import time
-            time.sleep(0.1)  # 100ms delay
+    # Build every event up front, then post them concurrently; the rate limiter paces
+    # sends (SIM_RATE_PER_SECOND) so the API is not overwhelmed
+    events = generate_batch(total_events)
+    sent = Counter()
+    failed = 0
+    for event_type, accepted in post_executor.map(post_event, events):
+        if accepted:
+            sent[event_type] += 1
+        else:
+            failed += 1
 
-    print(f"Simulation complete: {events_sent} events sent")
+    # One structured summary line per run instead of a log line per event
+    print(json.dumps({'sent': dict(sent), 'failed': failed, 'total': total_events}))
@@ -0,0 +1,54 @@
+"""
+SageMaker TensorFlow Serving pre/post-processing for the marketplace health model.
+
+Packaged into the model artifact as code/inference.py by train-sagemaker-model.py.
+Requests pass through to TF Serving unchanged. When the caller sends
+Accept: application/octet-stream, the response is returned as a packed
+little-endian float32 (N, 5) tensor instead of JSON, so clients can decode it
+with a single numpy.frombuffer.
+"""
+
+import json
+import numpy as np
+
+# Output order of the raw tensor (matches PREDICTION_KEYS in the ai-analysis Lambda)
+PREDICTION_KEYS = (
+    'first_session_success',
+    'session_velocity',
+    'churn_risk_14d',
+    'churn_risk_30d',
+    'health_score',
+)
+
+RAW_TENSOR_CONTENT_TYPE = 'application/octet-stream'
+
+
+def input_handler(data, context):
+    """Forward JSON and CSV request bodies to TF Serving as-is"""
+    if context.request_content_type == 'text/csv':
+        rows = [
+            [float(value) for value in line.split(',')]
+            for line in data.read().decode('utf-8').splitlines() if line
+        ]
+        return json.dumps({'instances': rows})
+
+    return data.read().decode('utf-8')
+
+
+def output_handler(data, context):
+    """Return TF Serving's JSON, or a float32 tensor when the caller asks for raw bytes"""
+    if data.status_code != 200:
+        raise ValueError(data.content.decode('utf-8'))
+
+    if context.accept_header != RAW_TENSOR_CONTENT_TYPE:
+        return data.content, context.accept_header
+
+    predictions = json.loads(data.content)['predictions']
+    if predictions and isinstance(predictions[0], dict):
+        # Multi-head format: {"health_score": [value], "session_velocity": [value], ...}
+        rows = [[prediction[key][0] for key in PREDICTION_KEYS] for prediction in predictions]
+    else:
+        rows = predictions
+
+    tensor = np.asarray(rows, dtype='<f4').reshape(-1, len(PREDICTION_KEYS))
+    return tensor.tobytes(), RAW_TENSOR_CONTENT_TYPE
@@ -6,22 +6,120 @@ Extracts 25 features from raw insight data for training
 """
 
 import json
+import tempfile
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import boto3
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library codec when orjson is not installed
+    orjson = None
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Without Numba the device kernel is swapped for its NumPy array version
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 # AWS Configuration
 S3_BUCKET = 'iops-ml-training'
 S3_RAW_PREFIX = 'raw/'
 S3_PROCESSED_PREFIX = 'processed/'
+# Each run writes its splits under a dated partition: processed/year=YYYY/month=MM/day=DD/train.csv
+PROCESSED_PARTITION_FORMAT = 'year=%Y/month=%m/day=%d/'
+
+# CSV exports are spooled in memory up to this size, then on local disk, while uploading
+CSV_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+CSV_CHUNK_ROWS = 10000
 
 s3_client = boto3.client('s3')
 
 
+@njit('void(int64[::1], float64[::1], int64, float64[::1], float64[::1])')
+def _device_value_scores(codes: np.ndarray, values: np.ndarray, device_count: int,
+                         anomaly: np.ndarray, trend: np.ndarray) -> None:
+    """
+    Per-row anomaly score (|value - device mean| / (device std + 1), sample std) and trend
+    (value minus the device's previous value in frame order, 0 for its first row) for
+    devices coded 0..device_count-1; rows coded -1 (no device) get NaN for both.
+    """
+    counts = np.zeros(device_count, dtype=np.int64)
+    sums = np.zeros(device_count)
+    previous = np.zeros(device_count)
+    for i in range(codes.shape[0]):
+        device = codes[i]
+        if device < 0:
+            trend[i] = np.nan
+            continue
+        trend[i] = values[i] - previous[device] if counts[device] > 0 else 0.0
+        previous[device] = values[i]
+        counts[device] += 1
+        sums[device] += values[i]
+
+    means = np.zeros(device_count)
+    for device in range(device_count):
+        if counts[device] > 0:
+            means[device] = sums[device] / counts[device]
+
+    squares = np.zeros(device_count)
+    for i in range(codes.shape[0]):
+        device = codes[i]
+        if device >= 0:
+            squares[device] += (values[i] - means[device]) ** 2
+
+    for i in range(codes.shape[0]):
+        device = codes[i]
+        if device < 0 or counts[device] < 2:
+            anomaly[i] = np.nan
+        else:
+            anomaly[i] = abs(values[i] - means[device]) / (np.sqrt(squares[device] / (counts[device] - 1)) + 1.0)
+
+
+def _device_value_scores_numpy(codes: np.ndarray, values: np.ndarray, device_count: int,
+                               anomaly: np.ndarray, trend: np.ndarray) -> None:
+    """Array-expression equivalent of _device_value_scores for when Numba is unavailable"""
+    known = codes >= 0
+    device_codes = codes[known]
+    device_values = values[known]
+
+    counts = np.bincount(device_codes, minlength=device_count)
+    means = np.bincount(device_codes, weights=device_values, minlength=device_count) / np.maximum(counts, 1)
+    deviations = device_values - means[device_codes]
+    squares = np.bincount(device_codes, weights=deviations ** 2, minlength=device_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stds = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+    anomaly[:] = np.nan
+    anomaly[known] = np.abs(deviations) / (stds[device_codes] + 1.0)
+
+    # Differences between consecutive rows of each device: stable sort by device keeps frame order
+    order = np.argsort(device_codes, kind='stable')
+    sorted_values = device_values[order]
+    device_trend = np.zeros(len(order))
+    device_trend[1:] = np.diff(sorted_values)
+    device_trend[np.flatnonzero(np.diff(device_codes[order])) + 1] = 0.0
+    unsorted = np.empty(len(order))
+    unsorted[order] = device_trend
+    trend[:] = np.nan
+    trend[known] = unsorted
+
+
+if not NUMBA_AVAILABLE:
+    # An interpreted row loop is far slower than the whole-column NumPy expressions
+    _device_value_scores = _device_value_scores_numpy
+
+
 class FeatureEngineer:
     """
     Extracts 25 features from IOPS insight data:
@@ -52,7 +150,9 @@ class FeatureEngineer:
     """
 
     def __init__(self):
-        self.scaler = StandardScaler()
+        # Standardization parameters fitted on the training split (float64, per feature column)
+        self.feature_mean = None
+        self.feature_scale = None
         self.label_encoder = LabelEncoder()
 
     def load_data_from_s3(self, file_key: str) -> pd.DataFrame:
@@ -60,7 +160,8 @@ class FeatureEngineer:
         print(f"📥 Loading data from s3://{S3_BUCKET}/{file_key}")
 
         response = s3_client.get_object(Bucket=S3_BUCKET, Key=file_key)
-        data = json.loads(response['Body'].read())
+        body = response['Body'].read()
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
 
         # Combine labeled and unlabeled data
         all_records = data['labeled_data'] + data['unlabeled_data']
@@ -69,56 +170,90 @@ class FeatureEngineer:
         print(f"   ✓ Labeled: {len(data['labeled_data'])}")
         print(f"   ✓ Unlabeled: {len(data['unlabeled_data'])}")
 
-        return pd.DataFrame(all_records)
+        return pd.DataFrame.from_records(all_records)
 
     def extract_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Extract all 25 features from raw data"""
         print("\n🔧 Extracting 25 features...")
 
-        features_df = pd.DataFrame()
+        # Per-device history features (rolling stds, diffs, trend) follow event time, so lay
+        # each device's events out contiguously in timestamp order before anything else
+        df = df.sort_values(['deviceId', 'timestamp'], kind='mergesort').reset_index(drop=True)
+
+        features_df = pd.DataFrame(index=df.index)
+
+        # Flatten the metadata dicts into columns in one pass
+        meta = pd.json_normalize(df['metadata'].tolist()).set_axis(df.index)
+
+        # Hash the deviceId strings once; every per-device pass below works on the int codes
+        # (code -1 marks a missing deviceId, which belongs to no device group)
+        device_codes, device_names = pd.factorize(df['deviceId'])
+        known_device = pd.Series(device_codes >= 0, index=df.index)
+
+        # Per-device history features share one grouping: rolling stds (10-sample window)
+        # and first differences for every series are computed together, without lambdas
+        device_history = pd.DataFrame({
+            'value': df['value'],
+            'bandwidth_mbps': meta['bandwidth_mbps'],
+            'error_rate': meta['error_rate'],
+            'io_size_kb': meta['io_size_kb'],
+        })
+        by_device = device_history.groupby(device_codes, sort=False)
+        rolling_stds = (
+            by_device[['value', 'bandwidth_mbps', 'io_size_kb']]
+            .rolling(window=10, min_periods=1).std()
+            .droplevel(0)
+            .reindex(df.index)
+            .where(known_device, axis=0)
+        )
+        diffs = by_device[['error_rate']].diff().where(known_device, axis=0)
+
+        # Device mean/std and previous-value differences of the IOPS value in one kernel pass
+        values = df['value'].to_numpy(dtype=np.float64, copy=True)
+        anomaly_scores = np.empty(len(values))
+        trend_scores = np.empty(len(values))
+        _device_value_scores(
+            np.ascontiguousarray(device_codes, dtype=np.int64), values, len(device_names),
+            anomaly_scores, trend_scores
+        )
 
         # ========== IOPS Metrics (4 features) ==========
-        features_df['read_iops'] = df['metadata'].apply(lambda x: x['read_iops'])
-        features_df['write_iops'] = df['metadata'].apply(lambda x: x['write_iops'])
-        features_df['total_iops'] = df['metadata'].apply(lambda x: x['total_iops'])
+        features_df['read_iops'] = meta['read_iops']
+        features_df['write_iops'] = meta['write_iops']
+        features_df['total_iops'] = meta['total_iops']
 
         # IOPS variance (rolling std over device history)
-        features_df['iops_variance'] = df.groupby('deviceId')['value'].transform(
-            lambda x: x.rolling(window=10, min_periods=1).std()
-        )
+        features_df['iops_variance'] = rolling_stds['value']
 
         print("   ✓ IOPS metrics (4)")
 
         # ========== Latency (4 features) ==========
-        features_df['avg_latency'] = df['metadata'].apply(lambda x: x['avg_latency'])
-        features_df['p95_latency'] = df['metadata'].apply(lambda x: x['p95_latency'])
-        features_df['p99_latency'] = df['metadata'].apply(lambda x: x['p99_latency'])
+        features_df['avg_latency'] = meta['avg_latency']
+        features_df['p95_latency'] = meta['p95_latency']
+        features_df['p99_latency'] = meta['p99_latency']
 
         # Latency spike count (p99 > 2x avg)
         features_df['latency_spike_count'] = (
             features_df['p99_latency'] > (2 * features_df['avg_latency'])
-        ).astype(int)
+        ).astype(np.int8)
 
         print("   ✓ Latency metrics (4)")
 
         # ========== Throughput (2 features) ==========
-        features_df['bandwidth_mbps'] = df['metadata'].apply(lambda x: x['bandwidth_mbps'])
+        features_df['bandwidth_mbps'] = meta['bandwidth_mbps']
 
         # Throughput variance
-        features_df['throughput_variance'] = df.groupby('deviceId')['metadata'].transform(
-            lambda x: x.apply(lambda m: m['bandwidth_mbps']).rolling(window=10, min_periods=1).std()
-        )
+        features_df['throughput_variance'] = rolling_stds['bandwidth_mbps']
 
         print("   ✓ Throughput metrics (2)")
 
         # ========== Error Rates (2 features) ==========
-        features_df['error_rate'] = df['metadata'].apply(lambda x: x['error_rate'])
+        features_df['error_rate'] = meta['error_rate']
 
         # Error trend (increasing = 1, stable = 0, decreasing = -1)
-        features_df['error_trend'] = df.groupby('deviceId')['metadata'].transform(
-            lambda x: x.apply(lambda m: m['error_rate']).diff().fillna(0).apply(
-                lambda d: 1 if d > 0.001 else (-1 if d < -0.001 else 0)
-            )
+        error_diff = diffs['error_rate'].fillna(0).to_numpy()
+        features_df['error_trend'] = np.select(
+            [error_diff > 0.001, error_diff < -0.001], [np.int8(1), np.int8(-1)], np.int8(0)
         )
 
         print("   ✓ Error rate metrics (2)")
@@ -134,21 +269,17 @@ class FeatureEngineer:
         print("   ✓ Time-based features (3)")
 
         # ========== Pattern (2 features) ==========
-        features_df['sequential_access_ratio'] = df['metadata'].apply(
-            lambda x: 1.0 if x['access_pattern'] == 'sequential' else 0.0
-        )
+        features_df['sequential_access_ratio'] = (meta['access_pattern'] == 'sequential').astype(np.float32)
         features_df['random_access_ratio'] = 1.0 - features_df['sequential_access_ratio']
 
         print("   ✓ Access pattern features (2)")
 
         # ========== Device (3 features) ==========
-        features_df['queue_depth'] = df['metadata'].apply(lambda x: x['queue_depth'])
-        features_df['io_size_avg'] = df['metadata'].apply(lambda x: x['io_size_kb'])
+        features_df['queue_depth'] = meta['queue_depth']
+        features_df['io_size_avg'] = meta['io_size_kb']
 
         # IO size variance
-        features_df['io_size_variance'] = df.groupby('deviceId')['metadata'].transform(
-            lambda x: x.apply(lambda m: m['io_size_kb']).rolling(window=10, min_periods=1).std()
-        )
+        features_df['io_size_variance'] = rolling_stds['io_size_kb']
 
         print("   ✓ Device metrics (3)")
 
@@ -157,14 +288,10 @@ class FeatureEngineer:
         features_df['iops_per_latency'] = features_df['total_iops'] / (features_df['avg_latency'] + 1)
 
         # Anomaly score (normalized deviation from device mean)
-        device_means = df.groupby('deviceId')['value'].transform('mean')
-        device_stds = df.groupby('deviceId')['value'].transform('std')
-        features_df['anomaly_score'] = np.abs(df['value'] - device_means) / (device_stds + 1)
+        features_df['anomaly_score'] = anomaly_scores
 
         # Trend score (rate of change)
-        features_df['trend_score'] = df.groupby('deviceId')['value'].transform(
-            lambda x: x.diff().fillna(0)
-        )
+        features_df['trend_score'] = trend_scores
 
         # Load factor (0-1 scale based on max theoretical IOPS)
         features_df['load_factor'] = features_df['total_iops'] / 15000.0
@@ -198,45 +325,74 @@ class FeatureEngineer:
         """Split into train/val/test (70/15/15)"""
         print("\n✂️  Splitting data (70/15/15)...")
 
-        # Separate labeled and unlabeled
-        labeled_df = df[df['risk_level'] != 'unknown'].copy()
-        unlabeled_df = df[df['risk_level'] == 'unknown'].copy()
+        # Separate labeled and unlabeled (row positions only; no frame is copied yet)
+        risk_levels = df['risk_level'].to_numpy()
+        labeled_rows = np.flatnonzero(risk_levels != 'unknown')
+        labeled_count = len(labeled_rows)
 
-        print(f"   • Labeled records: {len(labeled_df)}")
-        print(f"   • Unlabeled records: {len(unlabeled_df)}")
+        print(f"   • Labeled records: {labeled_count}")
+        print(f"   • Unlabeled records: {len(df) - labeled_count}")
 
-        # Split labeled data
-        train_df, temp_df = train_test_split(labeled_df, test_size=0.30, random_state=42, stratify=labeled_df['risk_level'])
-        val_df, test_df = train_test_split(temp_df, test_size=0.50, random_state=42, stratify=temp_df['risk_level'])
+        # Split labeled row positions (same shuffles as splitting the frames), then take each split once
+        train_rows, temp_rows = train_test_split(labeled_rows, test_size=0.30, random_state=42, stratify=risk_levels[labeled_rows])
+        val_rows, test_rows = train_test_split(temp_rows, test_size=0.50, random_state=42, stratify=risk_levels[temp_rows])
+        train_df, val_df, test_df = (df.take(rows) for rows in (train_rows, val_rows, test_rows))
 
-        print(f"   ✓ Train: {len(train_df)} ({len(train_df)/len(labeled_df)*100:.1f}%)")
-        print(f"   ✓ Validation: {len(val_df)} ({len(val_df)/len(labeled_df)*100:.1f}%)")
-        print(f"   ✓ Test: {len(test_df)} ({len(test_df)/len(labeled_df)*100:.1f}%)")
+        print(f"   ✓ Train: {len(train_df)} ({len(train_df)/labeled_count*100:.1f}%)")
+        print(f"   ✓ Validation: {len(val_df)} ({len(val_df)/labeled_count*100:.1f}%)")
+        print(f"   ✓ Test: {len(test_df)} ({len(test_df)/labeled_count*100:.1f}%)")
 
         return train_df, val_df, test_df
 
     def normalize_features(self, train_df: pd.DataFrame, val_df: pd.DataFrame, test_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        """Normalize numerical features using StandardScaler"""
+        """Standardize numerical features with the training split's mean and standard deviation"""
         print("\n📊 Normalizing features...")
 
         # Feature columns (exclude metadata)
         feature_cols = [col for col in train_df.columns if col not in
                        ['insight_id', 'device_id', 'timestamp', 'risk_level', 'performance_score']]
 
-        # Fit scaler on training data
-        train_df[feature_cols] = self.scaler.fit_transform(train_df[feature_cols])
-        val_df[feature_cols] = self.scaler.transform(val_df[feature_cols])
-        test_df[feature_cols] = self.scaler.transform(test_df[feature_cols])
+        # Features are standardized and saved as float32: XGBoost trains in float32, so float64
+        # only doubles the work and the uploaded payloads. Labels and ids keep their types.
+        train_features = train_df[feature_cols].to_numpy(dtype=np.float32)
+        val_features = val_df[feature_cols].to_numpy(dtype=np.float32)
+        test_features = test_df[feature_cols].to_numpy(dtype=np.float32)
+
+        # Fit on training data: statistics accumulate in float64 and ignore missing values
+        # (which stay NaN); constant features are only centered
+        self.feature_mean = np.nanmean(train_features, axis=0, dtype=np.float64)
+        self.feature_scale = np.nanstd(train_features, axis=0, dtype=np.float64)
+        self.feature_scale[self.feature_scale < 1e-8] = 1.0
+
+        # Standardize each split in place
+        mean = self.feature_mean.astype(np.float32)
+        scale = self.feature_scale.astype(np.float32)
+        for df, features in ((train_df, train_features), (val_df, val_features), (test_df, test_features)):
+            np.subtract(features, mean, out=features)
+            np.divide(features, scale, out=features)
+            df[feature_cols] = features
 
         print(f"   ✓ Normalized {len(feature_cols)} features")
 
         return train_df, val_df, test_df
 
+    def upload_csv(self, df: pd.DataFrame, key: str) -> None:
+        """
+        Write df as CSV to S3 without materializing it as one string: rows are written in
+        chunks to a spooled buffer and uploaded from there (multipart for large files).
+        """
+        with tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_MAX_BYTES, mode='w+b') as buffer:
+            df.to_csv(buffer, index=False, chunksize=CSV_CHUNK_ROWS)
+            buffer.seek(0)
+            s3_client.upload_fileobj(buffer, S3_BUCKET, key, ExtraArgs={'ContentType': 'text/csv'})
+
     def save_to_s3(self, train_df: pd.DataFrame, val_df: pd.DataFrame, test_df: pd.DataFrame) -> None:
         """Save processed datasets to S3"""
         print("\n☁️  Saving processed data to S3...")
 
-        timestamp = datetime.now().strftime('%Y-%m-%d')
+        now = datetime.now()
+        timestamp = now.strftime('%Y-%m-%d')
+        partition_prefix = f"{S3_PROCESSED_PREFIX}{now.strftime(PROCESSED_PARTITION_FORMAT)}"
 
         datasets = {
             'train': train_df,
@@ -245,18 +401,11 @@ class FeatureEngineer:
         }
 
         for name, df in datasets.items():
-            # Save as CSV
-            csv_key = f"{S3_PROCESSED_PREFIX}{name}-{timestamp}.csv"
-            csv_buffer = df.to_csv(index=False)
-            s3_client.put_object(Bucket=S3_BUCKET, Key=csv_key, Body=csv_buffer)
+            # Save as CSV (the SageMaker training channels read CSV only)
+            csv_key = f"{partition_prefix}{name}.csv"
+            self.upload_csv(df, csv_key)
             print(f"   ✓ Saved s3://{S3_BUCKET}/{csv_key}")
 
-            # Save as JSON for SageMaker
-            json_key = f"{S3_PROCESSED_PREFIX}{name}-{timestamp}.json"
-            json_buffer = df.to_json(orient='records')
-            s3_client.put_object(Bucket=S3_BUCKET, Key=json_key, Body=json_buffer)
-            print(f"   ✓ Saved s3://{S3_BUCKET}/{json_key}")
-
         # Save feature metadata
         feature_metadata = {
             'feature_count': 25,
@@ -271,8 +420,8 @@ class FeatureEngineer:
                 'derived': ['iops_per_latency', 'anomaly_score', 'trend_score', 'load_factor', 'efficiency_ratio']
             },
             'scaler_params': {
-                'mean': self.scaler.mean_.tolist() if hasattr(self.scaler, 'mean_') else [],
-                'scale': self.scaler.scale_.tolist() if hasattr(self.scaler, 'scale_') else []
+                'mean': self.feature_mean.tolist() if self.feature_mean is not None else [],
+                'scale': self.feature_scale.tolist() if self.feature_scale is not None else []
             },
             'dataset_sizes': {
                 'train': len(train_df),
@@ -282,7 +431,7 @@ class FeatureEngineer:
             'created_at': timestamp
         }
 
-        metadata_key = f"{S3_PROCESSED_PREFIX}feature-metadata-{timestamp}.json"
+        metadata_key = f"{partition_prefix}feature-metadata.json"
         s3_client.put_object(
             Bucket=S3_BUCKET,
             Key=metadata_key,
@@ -293,6 +442,17 @@ class FeatureEngineer:
         print("\n✅ All datasets saved to S3")
 
 
+def find_latest_object(prefix: str) -> Optional[Dict]:
+    """Most recently modified object under prefix (every listing page is read; only the newest is kept)"""
+    latest = None
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if latest is None or obj['LastModified'] >= latest['LastModified']:
+                latest = obj
+    return latest
+
+
 def main():
     """Main execution"""
     print("🚀 Starting Feature Engineering Pipeline\n")
@@ -302,13 +462,12 @@ def main():
 
     # Find latest raw data file in S3
     print("🔍 Finding latest raw data file...")
-    response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=S3_RAW_PREFIX)
-    if 'Contents' not in response or len(response['Contents']) == 0:
+    latest_file = find_latest_object(S3_RAW_PREFIX)
+    if latest_file is None:
         print("❌ No raw data files found in S3")
         print(f"   Please run generate-training-data.ts first to create data")
         return
 
-    latest_file = sorted(response['Contents'], key=lambda x: x['LastModified'])[-1]
     file_key = latest_file['Key']
     print(f"   ✓ Found: s3://{S3_BUCKET}/{file_key}\n")
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+SageMaker XGBoost (script mode) entry point for the IOPS models.
+
+Trains the risk level classifier and the performance score regressor in one job:
+each CSV channel is parsed once into a float32 QuantileDMatrix, and the two boosters take
+turns on the same matrices with the labels swapped. Validation metrics are printed
+every round. Both boosters are saved to the model directory; deployment repackages
+them as separate models of one multi-model endpoint.
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+try:
+    import pyarrow  # noqa: F401  (multi-threaded CSV parsing for pandas)
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
+
+# Label and id columns written by feature-engineering.py; every other column is a feature
+METADATA_COLUMNS = ['insight_id', 'device_id', 'timestamp', 'risk_level', 'performance_score']
+RISK_LEVELS = ['low', 'medium', 'high', 'critical']
+
+MODEL_FILES = {
+    'classifier': 'classifier.json',
+    'regressor': 'regressor.json',
+}
+
+# Spot training: boosters and early-stopping state are saved here every CHECKPOINT_ROUNDS rounds
+# (SageMaker syncs the directory to S3) and training resumes from them after an interruption
+CHECKPOINT_DIR = os.environ.get('IOPS_CHECKPOINT_DIR', '/opt/ml/checkpoints')
+CHECKPOINT_STATE_FILE = 'state.json'
+CHECKPOINT_ROUNDS = 10
+
+
+def load_channel(channel_dir: str, max_bin: int, ref: Optional[xgb.QuantileDMatrix] = None):
+    """
+    Parse a CSV channel into one histogram-binned QuantileDMatrix, its raw features and both label vectors.
+    The bins are computed once here (validation reuses the training bins via ref), so they do not
+    depend on which model's labels or weights are set when training starts.
+    Rows without a performance score (written as -1 by feature-engineering.py) get a NaN label,
+    which use_labels turns into zero weight for the regressor.
+    """
+    files = sorted(glob.glob(os.path.join(channel_dir, '*.csv')))
+    if not files:
+        raise ValueError(f"No .csv files found in {channel_dir}")
+
+    # Feature columns are parsed straight to float32 (what XGBoost bins), never as float64
+    header = pd.read_csv(files[0], nrows=0).columns
+    feature_cols = [col for col in header if col not in METADATA_COLUMNS]
+    dtypes = {col: np.float32 for col in feature_cols}
+    df = pd.concat((pd.read_csv(path, engine=CSV_ENGINE, dtype=dtypes) for path in files), ignore_index=True)
+
+    features = df[feature_cols].to_numpy(dtype=np.float32)
+    risk_labels = df['risk_level'].map({level: code for code, level in enumerate(RISK_LEVELS)}).to_numpy(dtype=np.float32)
+    perf_labels = df['performance_score'].where(df['performance_score'] >= 0).to_numpy(dtype=np.float32)
+
+    print(f"Loaded {len(df)} rows x {len(feature_cols)} features from {channel_dir}")
+    dmatrix = xgb.QuantileDMatrix(features, label=risk_labels, max_bin=max_bin, ref=ref)
+    return dmatrix, features, risk_labels, perf_labels
+
+
+def use_labels(dmatrix: xgb.QuantileDMatrix, labels: np.ndarray) -> None:
+    """Point a shared DMatrix at another label vector, weighting out missing labels"""
+    known = ~np.isnan(labels)
+    dmatrix.set_label(np.where(known, labels, 0.0))
+    dmatrix.set_weight(known.astype(np.float32))
+
+
+def cv_rounds(params: dict, features: np.ndarray, labels: np.ndarray, args, stratified: bool) -> int:
+    """
+    Number of boosting rounds chosen by k-fold cross-validated early stopping on the training split
+    (the mean over folds is a steadier stopping signal than one validation split)
+    """
+    d_cv = xgb.DMatrix(features)
+    use_labels(d_cv, labels)
+    history = xgb.cv(
+        params, d_cv, num_boost_round=args.num_round, nfold=args.cv_folds, stratified=stratified,
+        early_stopping_rounds=args.early_stopping_rounds, seed=0
+    )
+    return len(history)
+
+
+def save_checkpoint(runs: dict, iteration: int) -> None:
+    """Save both boosters, then the state file that marks the checkpoint complete"""
+    for name, run in runs.items():
+        run['booster'].save_model(os.path.join(CHECKPOINT_DIR, MODEL_FILES[name]))
+
+    state = {
+        'training_job': os.environ.get('TRAINING_JOB_NAME'),
+        'iteration': iteration,
+        'runs': {
+            name: {key: run[key] for key in ('best_score', 'best_iteration', 'stopped')}
+            for name, run in runs.items()
+        },
+    }
+    state_path = os.path.join(CHECKPOINT_DIR, CHECKPOINT_STATE_FILE)
+    with open(f"{state_path}.tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(f"{state_path}.tmp", state_path)
+
+
+def load_checkpoint() -> Optional[dict]:
+    """
+    State of the last complete checkpoint, or None when starting fresh. Checkpoints written by
+    another training job (e.g. a sibling tuning job sharing the S3 prefix) are ignored.
+    """
+    state_path = os.path.join(CHECKPOINT_DIR, CHECKPOINT_STATE_FILE)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        state = json.load(f)
+    return state if state.get('training_job') == os.environ.get('TRAINING_JOB_NAME') else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+
+    # Hyperparameters shared by both boosters (tuned by the HPO job)
+    parser.add_argument('--num_round', type=int, default=100)
+    parser.add_argument('--early_stopping_rounds', type=int, default=10)
+    parser.add_argument('--cv_folds', type=int, default=0)  # 2+ picks rounds by k-fold CV
+    parser.add_argument('--eta', type=float, default=0.2)
+    parser.add_argument('--max_depth', type=int, default=5)
+    parser.add_argument('--max_bin', type=int, default=64)
+    parser.add_argument('--min_child_weight', type=float, default=1.0)
+    parser.add_argument('--subsample', type=float, default=0.8)
+    parser.add_argument('--colsample_bytree', type=float, default=0.8)
+    parser.add_argument('--gamma', type=float, default=0.0)
+    parser.add_argument('--alpha', type=float, default=0.0)
+    parser.add_argument('--lambda', dest='reg_lambda', type=float, default=1.0)
+
+    args, _ = parser.parse_known_args()
+
+    model_dir = os.environ.get('SM_MODEL_DIR', '/opt/ml/model')
+    train_dir = os.environ.get('SM_CHANNEL_TRAIN', '/opt/ml/input/data/train')
+    validation_dir = os.environ.get('SM_CHANNEL_VALIDATION', '/opt/ml/input/data/validation')
+
+    d_train, train_features, train_risk, train_perf = load_channel(train_dir, args.max_bin)
+    d_val, _, val_risk, val_perf = load_channel(validation_dir, args.max_bin, ref=d_train)
+
+    # Histogram split finding (O(rows x features x bins) instead of exact's sorted scans)
+    shared_params = {
+        'tree_method': 'hist',
+        'max_bin': args.max_bin,
+        'eta': args.eta,
+        'max_depth': args.max_depth,
+        'min_child_weight': args.min_child_weight,
+        'subsample': args.subsample,
+        'colsample_bytree': args.colsample_bytree,
+        'gamma': args.gamma,
+        'alpha': args.alpha,
+        'lambda': args.reg_lambda,
+    }
+
+    # The two boosters advance one round at a time on the shared matrices (swapping labels), so the
+    # combined objective can be reported every round: Hyperband tuning ranks and stops jobs on it
+    runs = {
+        'classifier': {
+            'params': {**shared_params, 'objective': 'multi:softmax', 'num_class': len(RISK_LEVELS),
+                       'eval_metric': 'mlogloss'},
+            'labels': (train_risk, val_risk),
+        },
+        'regressor': {
+            'params': {**shared_params, 'objective': 'reg:squarederror', 'eval_metric': 'rmse'},
+            'labels': (train_perf, val_perf),
+        },
+    }
+
+    checkpoint = load_checkpoint()
+    start_iteration = checkpoint['iteration'] + 1 if checkpoint else 0
+    for name, run in runs.items():
+        if checkpoint:
+            run['booster'] = xgb.Booster(run['params'], [d_train, d_val],
+                                         model_file=os.path.join(CHECKPOINT_DIR, MODEL_FILES[name]))
+            run.update(checkpoint['runs'][name])
+        else:
+            run['booster'] = xgb.Booster(run['params'], [d_train, d_val])
+            run.update(best_score=float('inf'), best_iteration=0, stopped=False)
+    if checkpoint:
+        print(f"Resuming from checkpoint after round {checkpoint['iteration']}")
+
+    # With CV, each booster trains for exactly its cross-validated round count; otherwise it stops
+    # early on the validation split
+    if args.cv_folds > 1:
+        for name, run in runs.items():
+            run['rounds'] = cv_rounds(run['params'], train_features, run['labels'][0], args,
+                                      stratified=(name == 'classifier'))
+            print(f"{name}: {run['rounds']} rounds selected by {args.cv_folds}-fold CV")
+
+    # The tuner minimizes one number: log loss plus RMSE relative to the validation score spread,
+    # so neither model's metric dominates because of its units
+    perf_spread = float(np.nanstd(val_perf)) or 1.0
+
+    for iteration in range(start_iteration, args.num_round):
+        for run in runs.values():
+            if run['stopped']:
+                continue
+
+            train_labels, val_labels = run['labels']
+            use_labels(d_train, train_labels)
+            use_labels(d_val, val_labels)
+            run['booster'].update(d_train, iteration)
+            score = float(run['booster'].eval(d_val, 'validation', iteration).rsplit(':', 1)[1])
+
+            if score < run['best_score']:
+                run['best_score'], run['best_iteration'] = score, iteration
+
+            if 'rounds' in run:
+                run['stopped'] = iteration + 1 >= run['rounds']
+            elif iteration - run['best_iteration'] >= args.early_stopping_rounds:
+                run['stopped'] = True
+
+        mlogloss = runs['classifier']['best_score']
+        rmse = runs['regressor']['best_score']
+        combined = mlogloss + rmse / perf_spread
+        print(f"[{iteration}] validation:mlogloss={mlogloss:.6f} validation:rmse={rmse:.6f} "
+              f"validation:combined={combined:.6f}")
+
+        if all(run['stopped'] for run in runs.values()):
+            break
+
+        if os.path.isdir(CHECKPOINT_DIR) and (iteration + 1) % CHECKPOINT_ROUNDS == 0:
+            save_checkpoint(runs, iteration)
+
+    # Keep each booster's rounds up to its best validation score (all of them when CV chose the count)
+    os.makedirs(model_dir, exist_ok=True)
+    for name, run in runs.items():
+        best_booster = run['booster'][: run.get('rounds', run['best_iteration'] + 1)]
+        best_booster.save_model(os.path.join(model_dir, MODEL_FILES[name]))
+    print(f"Saved boosters to {model_dir}")
+
+
+if __name__ == '__main__':
+    main()
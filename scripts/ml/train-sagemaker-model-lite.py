@@ -65,6 +65,7 @@ def create_xgboost_estimator(model_type='classifier'):
 
     # Base hyperparameters - optimized for speed
     hyperparameters = {
+        'tree_method': 'hist',  # Histogram split finding instead of the exact default
         'max_depth': '5',  # Reduced from 8
         'eta': '0.2',  # Faster learning
         'objective': 'multi:softmax' if model_type == 'classifier' else 'reg:squarederror',
@@ -4,40 +4,111 @@
 SageMaker Training Script for IOPS ML Models
 - XGBoost Classifier: Risk level prediction (4 classes: low, medium, high, critical)
 - XGBoost Regressor: Performance score forecasting (0-100 continuous)
-- Hyperparameter tuning: 50 jobs
-- Auto-scaling deployment: ml.t3.medium (1-3 instances)
+- Both trained by one script-mode job (train-entry.py) that parses the CSVs once
+- Hyperparameter tuning: Hyperband, up to 200 jobs (most stopped after a few rounds)
+- Auto-scaling deployment: one multi-model endpoint for both models, ml.t3.medium (1-3 instances)
 """
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 import sagemaker
 from sagemaker import get_execution_role
-from sagemaker.estimator import Estimator
-from sagemaker.tuner import HyperparameterTuner, IntegerParameter, ContinuousParameter, CategoricalParameter
+from sagemaker.xgboost.estimator import XGBoost
+from sagemaker.tuner import (
+    HyperparameterTuner, IntegerParameter, ContinuousParameter, CategoricalParameter,
+    HyperbandStrategyConfig, StrategyConfig
+)
 from sagemaker.inputs import TrainingInput
-from sagemaker.predictor import Predictor
-from sagemaker.serializers import CSVSerializer
-from sagemaker.deserializers import JSONDeserializer
+from sagemaker.transformer import Transformer
+from sklearn.metrics import accuracy_score, mean_absolute_error, mean_squared_error, precision_recall_fscore_support
+import numpy as np
+import pandas as pd
+import io
 import json
-from datetime import datetime
+import os
+import tarfile
+import tempfile
+from datetime import datetime, timedelta
 import time
+from typing import Tuple
 
 # Configuration
 S3_BUCKET = 'iops-ml-training'
 S3_PROCESSED_PREFIX = 'processed/'
+# feature-engineering.py writes each run's splits under processed/year=YYYY/month=MM/day=DD/;
+# the newest of the last DATA_LOOKBACK_DAYS days' partitions is used
+PROCESSED_PARTITION_FORMAT = 'year=%Y/month=%m/day=%d/'
+DATA_LOOKBACK_DAYS = 7
+DATA_SPLITS = ('train', 'validation', 'test')
 S3_MODEL_PREFIX = 'models/'
+# The train/validation CSVs are copied to an S3 Express One Zone directory bucket before tuning,
+# since every tuning job re-reads them; test data and model artifacts stay in S3_BUCKET
+USE_S3_EXPRESS_TRAINING_DATA = True
+S3_EXPRESS_BUCKET = 'iops-ml-training--use1-az4--x-s3'
 REGION = 'us-east-1'
 
 # SageMaker configuration
 INSTANCE_TYPE = 'ml.m5.xlarge'  # Training instance
+# Managed spot training; interrupted jobs resume from train-entry.py's checkpoints
+USE_SPOT_INSTANCES = True
+MAX_RUN_SECONDS = 3600
+MAX_WAIT_SECONDS = 7200  # Training time plus time spent waiting for spot capacity
+XGBOOST_FRAMEWORK_VERSION = '1.7-1'  # Script-mode container, used for training and serving
+# Channels are streamed from S3 on first read instead of copied to the instance before training
+INPUT_MODE = 'FastFile'
+TRAIN_ENTRY_POINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'train-entry.py')
 ENDPOINT_INSTANCE_TYPE = 'ml.t3.medium'  # Inference instance
+TRANSFORM_INSTANCE_TYPE = 'ml.m5.large'  # Batch Transform instance for test-set evaluation
+# Both instance types have 2 vCPUs: one model server worker per vCPU, each scoring single-threaded,
+# instead of every worker starting an OpenMP thread per core
+SERVING_ENVIRONMENT = {
+    'OMP_NUM_THREADS': '1',
+    'SAGEMAKER_MODEL_SERVER_WORKERS': '2',
+    'SAGEMAKER_MODEL_SERVER_TIMEOUT': '60',
+}
 MIN_INSTANCES = 1
 MAX_INSTANCES = 3
+# Step scaling adds capacity once invocations/instance/minute reach this (half the tracking target),
+# so a second instance is booting before the target tracking policy would react
+TARGET_INVOCATIONS_PER_INSTANCE = 70.0
+STEP_SCALING_THRESHOLD = 35.0
 TARGET_ACCURACY = 0.90
 
+# Boosting rounds per model; Hyperband gives every config at least MIN_ROUNDS before stopping it
+NUM_ROUND = 100
+HYPERBAND_MIN_ROUNDS = 10
+MAX_TUNING_JOBS = 200
+MAX_PARALLEL_TUNING_JOBS = 10
+
+# Both boosters are served by one multi-model endpoint; callers pick one with TargetModel
+MULTI_MODEL_NAME = 'iops-models'
+TARGET_MODELS = {
+    'classifier': 'classifier.tar.gz',
+    'regressor': 'regressor.tar.gz',
+}
+
+# Label and id columns written by feature-engineering.py; every other column is a feature
+METADATA_COLUMNS = ['insight_id', 'device_id', 'timestamp', 'risk_level', 'performance_score']
+RISK_LEVELS = ['low', 'medium', 'high', 'critical']
+FEATURE_COUNT = 25
+
+# Metrics printed by train-entry.py; the tuner minimizes the combined one
+TUNING_OBJECTIVE = 'validation:combined'
+METRIC_DEFINITIONS = [
+    {'Name': name, 'Regex': f'{name}=([0-9\\.]+)'}
+    for name in ('validation:mlogloss', 'validation:rmse', TUNING_OBJECTIVE)
+]
+
 # Initialize clients
 sagemaker_client = boto3.client('sagemaker', region_name=REGION)
+sagemaker_runtime = boto3.client('sagemaker-runtime', region_name=REGION)
 s3_client = boto3.client('s3', region_name=REGION)
 
+# Objects above 8 MB (test splits, model artifacts) move as parallel multipart/ranged transfers;
+# the buffers spool to disk past the same size
+S3_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=10)
+S3_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
 # Get SageMaker session and role
 sagemaker_session = sagemaker.Session()
 try:
@@ -49,6 +120,15 @@ except:
     print("   Please update with your actual SageMaker execution role ARN")
 
 
+def download_s3_object(s3_uri: str) -> tempfile.SpooledTemporaryFile:
+    """Download an s3:// object with the parallel transfer config into a rewound spooled buffer"""
+    bucket, key = s3_uri.replace('s3://', '', 1).split('/', 1)
+    buffer = tempfile.SpooledTemporaryFile(max_size=S3_SPOOL_MAX_BYTES, mode='w+b')
+    s3_client.download_fileobj(bucket, key, buffer, Config=S3_TRANSFER_CONFIG)
+    buffer.seek(0)
+    return buffer
+
+
 class IOPSModelTrainer:
     """Trains and deploys IOPS ML models on SageMaker"""
 
@@ -56,113 +136,85 @@ class IOPSModelTrainer:
         self.session = sagemaker_session
         self.role = role
         self.timestamp = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        self.model_data_prefix = None
+        self.image_uri = sagemaker.image_uris.retrieve(
+            framework='xgboost',
+            region=REGION,
+            version=XGBOOST_FRAMEWORK_VERSION
+        )
 
     def get_latest_data_paths(self) -> dict:
         """Find latest processed training data in S3"""
         print("🔍 Finding latest processed data...")
 
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=S3_PROCESSED_PREFIX)
-
-        if 'Contents' not in response:
-            raise ValueError(f"No processed data found in s3://{S3_BUCKET}/{S3_PROCESSED_PREFIX}")
-
-        # Find latest files
-        files = sorted(response['Contents'], key=lambda x: x['LastModified'], reverse=True)
-
-        train_file = next((f['Key'] for f in files if 'train' in f['Key'] and f['Key'].endswith('.csv')), None)
-        val_file = next((f['Key'] for f in files if 'validation' in f['Key'] and f['Key'].endswith('.csv')), None)
-        test_file = next((f['Key'] for f in files if 'test' in f['Key'] and f['Key'].endswith('.csv')), None)
-
-        if not all([train_file, val_file, test_file]):
-            raise ValueError("Missing required dataset files (train/validation/test)")
+        # Walk back one day at a time, listing only that day's partition, until one has every split
+        today = datetime.now()
+        for days_back in range(DATA_LOOKBACK_DAYS):
+            day = today - timedelta(days=days_back)
+            partition_prefix = f"{S3_PROCESSED_PREFIX}{day.strftime(PROCESSED_PARTITION_FORMAT)}"
+            response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=partition_prefix, Delimiter='/')
+            keys = {obj['Key'] for obj in response.get('Contents', [])}
+            split_keys = {split: f"{partition_prefix}{split}.csv" for split in DATA_SPLITS}
+            if all(key in keys for key in split_keys.values()):
+                break
+        else:
+            raise ValueError(
+                f"Missing required dataset files (train/validation/test) in the last {DATA_LOOKBACK_DAYS} days "
+                f"of s3://{S3_BUCKET}/{S3_PROCESSED_PREFIX}"
+            )
 
-        paths = {
-            'train': f"s3://{S3_BUCKET}/{train_file}",
-            'validation': f"s3://{S3_BUCKET}/{val_file}",
-            'test': f"s3://{S3_BUCKET}/{test_file}"
-        }
+        paths = {split: f"s3://{S3_BUCKET}/{key}" for split, key in split_keys.items()}
 
-        print(f"   ✓ Train: {train_file}")
-        print(f"   ✓ Validation: {val_file}")
-        print(f"   ✓ Test: {test_file}\n")
+        print(f"   ✓ Train: {split_keys['train']}")
+        print(f"   ✓ Validation: {split_keys['validation']}")
+        print(f"   ✓ Test: {split_keys['test']}\n")
 
         return paths
 
-    def get_xgboost_image_uri(self) -> str:
-        """Get XGBoost container image URI"""
-        return sagemaker.image_uris.retrieve(
-            framework='xgboost',
-            region=REGION,
-            version='latest'
-        )
-
-    def create_classifier_estimator(self) -> Estimator:
-        """Create XGBoost classifier for risk level prediction"""
-        print("🔧 Creating XGBoost Classifier estimator...")
-
-        image_uri = self.get_xgboost_image_uri()
-
-        estimator = Estimator(
-            image_uri=image_uri,
-            role=self.role,
-            instance_count=1,
-            instance_type=INSTANCE_TYPE,
-            output_path=f"s3://{S3_BUCKET}/{S3_MODEL_PREFIX}classifier/",
-            sagemaker_session=self.session,
-            base_job_name='iops-risk-classifier',
-            hyperparameters={
-                'objective': 'multi:softmax',  # Multi-class classification
-                'num_class': 4,  # low, medium, high, critical
-                'num_round': 100,
-                'eval_metric': 'mlogloss',
-                'eta': 0.2,
-                'max_depth': 5,
-                'subsample': 0.8,
-                'colsample_bytree': 0.8,
-                'early_stopping_rounds': 10
-            }
-        )
-
-        print("   ✓ Classifier estimator created\n")
-        return estimator
-
-    def create_regressor_estimator(self) -> Estimator:
-        """Create XGBoost regressor for performance forecasting"""
-        print("🔧 Creating XGBoost Regressor estimator...")
+    def create_estimator(self) -> XGBoost:
+        """Create the script-mode XGBoost estimator that trains the classifier and regressor together"""
+        print("🔧 Creating XGBoost estimator (classifier + regressor)...")
 
-        image_uri = self.get_xgboost_image_uri()
-
-        estimator = Estimator(
-            image_uri=image_uri,
+        estimator = XGBoost(
+            entry_point=TRAIN_ENTRY_POINT,
+            framework_version=XGBOOST_FRAMEWORK_VERSION,
+            image_uri=self.image_uri,
             role=self.role,
             instance_count=1,
             instance_type=INSTANCE_TYPE,
-            output_path=f"s3://{S3_BUCKET}/{S3_MODEL_PREFIX}regressor/",
+            output_path=f"s3://{S3_BUCKET}/{S3_MODEL_PREFIX}",
             sagemaker_session=self.session,
-            base_job_name='iops-perf-regressor',
+            base_job_name='iops-models',
+            metric_definitions=METRIC_DEFINITIONS,
+            input_mode=INPUT_MODE,
+            use_spot_instances=USE_SPOT_INSTANCES,
+            max_run=MAX_RUN_SECONDS,
+            max_wait=MAX_WAIT_SECONDS,
+            checkpoint_s3_uri=f"s3://{S3_BUCKET}/checkpoints/iops-models/",
             hyperparameters={
-                'objective': 'reg:squarederror',  # Regression
-                'num_round': 100,
-                'eval_metric': 'rmse',
+                'num_round': NUM_ROUND,
                 'eta': 0.2,
                 'max_depth': 5,
+                'max_bin': 64,  # Histogram bins per feature (fewer bins, cheaper histogram passes)
                 'subsample': 0.8,
                 'colsample_bytree': 0.8,
-                'early_stopping_rounds': 10
+                'early_stopping_rounds': 10,
+                'cv_folds': 5  # Round count chosen by 5-fold CV early stopping
             }
         )
 
-        print("   ✓ Regressor estimator created\n")
+        print("   ✓ Estimator created\n")
         return estimator
 
-    def create_hyperparameter_tuner(self, estimator: Estimator, model_type: str) -> HyperparameterTuner:
+    def create_hyperparameter_tuner(self, estimator: XGBoost) -> HyperparameterTuner:
         """Create hyperparameter tuner for optimization"""
-        print(f"🎛️  Creating hyperparameter tuner for {model_type}...")
+        print("🎛️  Creating hyperparameter tuner...")
 
         # Define hyperparameter ranges
         hyperparameter_ranges = {
             'eta': ContinuousParameter(0.01, 0.3),
             'max_depth': IntegerParameter(3, 10),
+            'max_bin': CategoricalParameter([32, 64, 128, 256]),
             'min_child_weight': IntegerParameter(1, 10),
             'subsample': ContinuousParameter(0.5, 1.0),
             'colsample_bytree': ContinuousParameter(0.5, 1.0),
@@ -171,47 +223,53 @@ class IOPSModelTrainer:
             'lambda': ContinuousParameter(0, 2)
         }
 
-        # Metric to optimize
-        if model_type == 'classifier':
-            metric_name = 'validation:mlogloss'
-            metric_type = 'Minimize'
-        else:
-            metric_name = 'validation:rmse'
-            metric_type = 'Minimize'
-
+        # Classifier log loss plus normalized regressor RMSE (see train-entry.py)
         tuner = HyperparameterTuner(
             estimator=estimator,
-            objective_metric_name=metric_name,
-            objective_type=metric_type,
+            objective_metric_name=TUNING_OBJECTIVE,
+            objective_type='Minimize',
+            metric_definitions=[d for d in METRIC_DEFINITIONS if d['Name'] == TUNING_OBJECTIVE],
             hyperparameter_ranges=hyperparameter_ranges,
-            max_jobs=50,
-            max_parallel_jobs=5,
-            strategy='Bayesian',
-            early_stopping_type='Auto',
-            base_tuning_job_name=f'iops-{model_type}-tuning'
+            max_jobs=MAX_TUNING_JOBS,
+            max_parallel_jobs=MAX_PARALLEL_TUNING_JOBS,
+            # Hyperband ranks jobs on the per-round objective and stops weak configs early
+            # (it does its own early stopping, so the tuner-level setting must stay off)
+            strategy='Hyperband',
+            strategy_config=StrategyConfig(
+                hyperband_strategy_config=HyperbandStrategyConfig(
+                    min_resource=HYPERBAND_MIN_ROUNDS,
+                    max_resource=NUM_ROUND
+                )
+            ),
+            early_stopping_type='Off',
+            base_tuning_job_name='iops-models-tuning'
         )
 
-        print(f"   ✓ Tuner created with 50 jobs (5 parallel)\n")
+        print(f"   ✓ Hyperband tuner created with up to {MAX_TUNING_JOBS} jobs ({MAX_PARALLEL_TUNING_JOBS} parallel)\n")
         return tuner
 
-    def train_classifier(self, data_paths: dict) -> str:
-        """Train risk level classifier with hyperparameter tuning"""
-        print("🚀 Starting Classifier Training with Hyperparameter Tuning\n")
+    def train_models(self, data_paths: dict) -> str:
+        """Train the risk classifier and performance regressor with one hyperparameter tuning run"""
+        print("🚀 Starting Classifier + Regressor Training with Hyperparameter Tuning\n")
 
         # Create estimator
-        estimator = self.create_classifier_estimator()
+        estimator = self.create_estimator()
 
         # Create tuner
-        tuner = self.create_hyperparameter_tuner(estimator, 'classifier')
+        tuner = self.create_hyperparameter_tuner(estimator)
 
         # Prepare training data
+        if USE_S3_EXPRESS_TRAINING_DATA:
+            data_paths = self.stage_training_data(data_paths)
         train_input = TrainingInput(
             s3_data=data_paths['train'],
-            content_type='text/csv'
+            content_type='text/csv',
+            input_mode=INPUT_MODE
         )
         validation_input = TrainingInput(
             s3_data=data_paths['validation'],
-            content_type='text/csv'
+            content_type='text/csv',
+            input_mode=INPUT_MODE
         )
 
         # Start tuning
@@ -221,60 +279,68 @@ class IOPSModelTrainer:
             'validation': validation_input
         })
 
-        print("✅ Classifier training complete!")
+        print("✅ Training complete!")
         print(f"   • Best training job: {tuner.best_training_job()}")
         print(f"   • Model artifacts: {tuner.best_estimator().model_data}\n")
 
         return tuner.best_training_job()
 
-    def train_regressor(self, data_paths: dict) -> str:
-        """Train performance forecasting regressor with hyperparameter tuning"""
-        print("🚀 Starting Regressor Training with Hyperparameter Tuning\n")
+    def stage_training_data(self, data_paths: dict) -> dict:
+        """Copy the train and validation CSVs to the S3 Express bucket; returns data_paths pointing at the copies"""
+        print(f"⚡ Staging training data in s3://{S3_EXPRESS_BUCKET}...")
 
-        # Create estimator
-        estimator = self.create_regressor_estimator()
+        staged_paths = dict(data_paths)
+        for channel in ('train', 'validation'):
+            key = data_paths[channel].split(f"s3://{S3_BUCKET}/", 1)[1]
+            s3_client.copy({'Bucket': S3_BUCKET, 'Key': key}, S3_EXPRESS_BUCKET, key, Config=S3_TRANSFER_CONFIG)
+            staged_paths[channel] = f"s3://{S3_EXPRESS_BUCKET}/{key}"
+            print(f"   ✓ {channel}: {staged_paths[channel]}")
 
-        # Create tuner
-        tuner = self.create_hyperparameter_tuner(estimator, 'regressor')
+        print()
+        return staged_paths
 
-        # Prepare training data
-        train_input = TrainingInput(
-            s3_data=data_paths['train'],
-            content_type='text/csv'
-        )
-        validation_input = TrainingInput(
-            s3_data=data_paths['validation'],
-            content_type='text/csv'
-        )
-
-        # Start tuning
-        print("⏳ Launching tuning job (this will take 30-60 minutes)...")
-        tuner.fit({
-            'train': train_input,
-            'validation': validation_input
-        })
-
-        print("✅ Regressor training complete!")
-        print(f"   • Best training job: {tuner.best_training_job()}")
-        print(f"   • Model artifacts: {tuner.best_estimator().model_data}\n")
+    def package_multi_model_artifacts(self, training_job_name: str) -> str:
+        """
+        Split the training job's artifact (both boosters) into one model.tar.gz per booster under a
+        common S3 prefix, as a multi-model endpoint expects; returns the prefix URI
+        """
+        print("📦 Packaging boosters for the multi-model endpoint...")
 
-        return tuner.best_training_job()
-
-    def deploy_with_autoscaling(self, model_name: str, training_job_name: str) -> str:
-        """Deploy model with auto-scaling configuration"""
-        print(f"🚀 Deploying {model_name} with auto-scaling...\n")
-
-        # Get model artifacts
         model_data = sagemaker_client.describe_training_job(
             TrainingJobName=training_job_name
         )['ModelArtifacts']['S3ModelArtifacts']
+        prefix = f"{S3_MODEL_PREFIX}mme/{self.timestamp}/"
+        self.model_data_prefix = f"s3://{S3_BUCKET}/{prefix}"
+        with download_s3_object(model_data) as artifact, tarfile.open(fileobj=artifact, mode='r:gz') as job_archive:
+            for name, target_model in TARGET_MODELS.items():
+                booster = job_archive.extractfile(f"{name}.json").read()
+
+                # The XGBoost container's multi-model mode loads the single booster file in each archive
+                package = io.BytesIO()
+                with tarfile.open(fileobj=package, mode='w:gz') as model_archive:
+                    member = tarfile.TarInfo('xgboost-model')
+                    member.size = len(booster)
+                    model_archive.addfile(member, io.BytesIO(booster))
+
+                package.seek(0)
+                s3_client.upload_fileobj(package, S3_BUCKET, f"{prefix}{target_model}", Config=S3_TRANSFER_CONFIG)
+                print(f"   ✓ {name}: s3://{S3_BUCKET}/{prefix}{target_model}")
+
+        print()
+        return self.model_data_prefix
+
+    def deploy_with_autoscaling(self, model_data_prefix: str) -> str:
+        """Deploy both packaged boosters behind one multi-model endpoint with auto-scaling"""
+        print(f"🚀 Deploying {MULTI_MODEL_NAME} (multi-model) with auto-scaling...\n")
 
         # Create model
         model_config = {
-            'ModelName': f"{model_name}-{self.timestamp}",
+            'ModelName': f"{MULTI_MODEL_NAME}-{self.timestamp}",
             'PrimaryContainer': {
-                'Image': self.get_xgboost_image_uri(),
-                'ModelDataUrl': model_data
+                'Image': self.image_uri,
+                'Mode': 'MultiModel',
+                'ModelDataUrl': model_data_prefix,
+                'Environment': SERVING_ENVIRONMENT
             },
             'ExecutionRoleArn': self.role
         }
@@ -283,7 +349,7 @@ class IOPSModelTrainer:
         print(f"   ✓ Model created: {model_config['ModelName']}")
 
         # Create endpoint config with auto-scaling
-        endpoint_config_name = f"{model_name}-endpoint-config-{self.timestamp}"
+        endpoint_config_name = f"{MULTI_MODEL_NAME}-endpoint-config-{self.timestamp}"
         endpoint_config = {
             'EndpointConfigName': endpoint_config_name,
             'ProductionVariants': [{
@@ -299,7 +365,7 @@ class IOPSModelTrainer:
         print(f"   ✓ Endpoint config created: {endpoint_config_name}")
 
         # Create endpoint
-        endpoint_name = f"{model_name}-endpoint-{self.timestamp}"
+        endpoint_name = f"{MULTI_MODEL_NAME}-endpoint-{self.timestamp}"
         sagemaker_client.create_endpoint(
             EndpointName=endpoint_name,
             EndpointConfigName=endpoint_config_name
@@ -314,8 +380,33 @@ class IOPSModelTrainer:
 
         print(f"   ✅ Endpoint ready: {endpoint_name}\n")
 
-        # Configure auto-scaling
+        self.warm_endpoint(endpoint_name)
+        self.configure_autoscaling(endpoint_name)
+
+        return endpoint_name
+
+    def warm_endpoint(self, endpoint_name: str) -> None:
+        """
+        Invoke every target model once so the multi-model container has downloaded and loaded
+        both boosters before the first real request arrives
+        """
+        warmup_row = ','.join(['0'] * FEATURE_COUNT)
+        for target_model in TARGET_MODELS.values():
+            sagemaker_runtime.invoke_endpoint(
+                EndpointName=endpoint_name,
+                TargetModel=target_model,
+                ContentType='text/csv',
+                Body=warmup_row
+            )
+            print(f"   ✓ Warmed {target_model}")
+
+    def configure_autoscaling(self, endpoint_name: str) -> None:
+        """
+        Register the endpoint's variant for auto-scaling: target tracking for steady state plus an
+        early step scaling policy that pre-provisions capacity when traffic starts to climb
+        """
         autoscaling_client = boto3.client('application-autoscaling', region_name=REGION)
+        cloudwatch_client = boto3.client('cloudwatch', region_name=REGION)
 
         resource_id = f"endpoint/{endpoint_name}/variant/AllTraffic"
 
@@ -338,7 +429,7 @@ class IOPSModelTrainer:
             ScalableDimension='sagemaker:variant:DesiredInstanceCount',
             PolicyType='TargetTrackingScaling',
             TargetTrackingScalingPolicyConfiguration={
-                'TargetValue': 70.0,  # Target 70% invocations per instance
+                'TargetValue': TARGET_INVOCATIONS_PER_INSTANCE,  # Invocations per instance per minute
                 'PredefinedMetricSpecification': {
                     'PredefinedMetricType': 'SageMakerVariantInvocationsPerInstance'
                 },
@@ -347,45 +438,160 @@ class IOPSModelTrainer:
             }
         )
 
-        print(f"   ✓ Scaling policy created (target: 70% invocations/instance)")
+        print(f"   ✓ Scaling policy created (target: {TARGET_INVOCATIONS_PER_INSTANCE:.0f} invocations/instance)")
+
+        # Step scaling policy: +1 instance from the threshold, +2 past the tracking target.
+        # Intervals are relative to the alarm threshold below.
+        step_policy = autoscaling_client.put_scaling_policy(
+            PolicyName=f"{endpoint_name}-step-scaling-policy",
+            ServiceNamespace='sagemaker',
+            ResourceId=resource_id,
+            ScalableDimension='sagemaker:variant:DesiredInstanceCount',
+            PolicyType='StepScaling',
+            StepScalingPolicyConfiguration={
+                'AdjustmentType': 'ChangeInCapacity',
+                'MetricAggregationType': 'Average',
+                'Cooldown': 60,
+                'StepAdjustments': [
+                    {
+                        'MetricIntervalLowerBound': 0.0,
+                        'MetricIntervalUpperBound': TARGET_INVOCATIONS_PER_INSTANCE - STEP_SCALING_THRESHOLD,
+                        'ScalingAdjustment': 1
+                    },
+                    {
+                        'MetricIntervalLowerBound': TARGET_INVOCATIONS_PER_INSTANCE - STEP_SCALING_THRESHOLD,
+                        'ScalingAdjustment': 2
+                    }
+                ]
+            }
+        )
+
+        cloudwatch_client.put_metric_alarm(
+            AlarmName=f"{endpoint_name}-step-scaling-alarm",
+            Namespace='AWS/SageMaker',
+            MetricName='InvocationsPerInstance',
+            Dimensions=[
+                {'Name': 'EndpointName', 'Value': endpoint_name},
+                {'Name': 'VariantName', 'Value': 'AllTraffic'}
+            ],
+            Statistic='Sum',
+            Period=60,
+            EvaluationPeriods=1,
+            Threshold=STEP_SCALING_THRESHOLD,
+            ComparisonOperator='GreaterThanOrEqualToThreshold',
+            AlarmActions=[step_policy['PolicyARN']]
+        )
+
+        print(f"   ✓ Step scaling policy created (from {STEP_SCALING_THRESHOLD:.0f} invocations/instance)")
         print(f"\n✅ Deployment complete: {endpoint_name}\n")
 
-        return endpoint_name
+    def prepare_test_set(self, test_data_path: str) -> Tuple[str, pd.DataFrame]:
+        """
+        Upload the test split's feature columns as a headerless CSV for Batch Transform;
+        returns its S3 URI and the labels (same row order) for scoring the predictions
+        """
+        print("   • Loading test data...")
 
-    def evaluate_model(self, endpoint_name: str, test_data_path: str) -> dict:
-        """Evaluate model on test set"""
-        print(f"📊 Evaluating model: {endpoint_name}\n")
+        with download_s3_object(test_data_path) as test_csv:
+            test_df = pd.read_csv(test_csv)
+        # feature-engineering.py writes a missing performance score as -1
+        test_df['performance_score'] = test_df['performance_score'].where(test_df['performance_score'] >= 0)
+        feature_cols = [col for col in test_df.columns if col not in METADATA_COLUMNS]
+
+        features_key = f"{S3_MODEL_PREFIX}evaluation/{self.timestamp}/test-features.csv"
+        with tempfile.SpooledTemporaryFile(max_size=S3_SPOOL_MAX_BYTES, mode='w+b') as buffer:
+            test_df[feature_cols].to_csv(buffer, header=False, index=False)
+            buffer.seek(0)
+            s3_client.upload_fileobj(buffer, S3_BUCKET, features_key, Config=S3_TRANSFER_CONFIG)
+        print(f"   ✓ {len(test_df)} test rows staged: s3://{S3_BUCKET}/{features_key}\n")
+
+        return f"s3://{S3_BUCKET}/{features_key}", test_df[['risk_level', 'performance_score']]
+
+    def start_batch_transform(self, target_model: str, features_uri: str) -> Transformer:
+        """Start a Batch Transform job scoring the staged test features with one booster; does not wait"""
+        model_name = f"{MULTI_MODEL_NAME}-{target_model}-{self.timestamp}"
+        sagemaker_client.create_model(
+            ModelName=model_name,
+            PrimaryContainer={
+                'Image': self.image_uri,
+                'ModelDataUrl': f"{self.model_data_prefix}{TARGET_MODELS[target_model]}",
+                'Environment': SERVING_ENVIRONMENT
+            },
+            ExecutionRoleArn=self.role
+        )
 
-        # Create predictor
-        predictor = Predictor(
-            endpoint_name=endpoint_name,
-            sagemaker_session=self.session,
-            serializer=CSVSerializer(),
-            deserializer=JSONDeserializer()
+        output_prefix = f"{S3_MODEL_PREFIX}evaluation/{self.timestamp}/{target_model}/"
+        transformer = Transformer(
+            model_name=model_name,
+            instance_count=1,
+            instance_type=TRANSFORM_INSTANCE_TYPE,
+            strategy='MultiRecord',
+            max_payload=6,
+            assemble_with='Line',
+            accept='text/csv',
+            output_path=f"s3://{S3_BUCKET}/{output_prefix}",
+            sagemaker_session=self.session
         )
+        transformer.transform(features_uri, content_type='text/csv', split_type='Line', wait=False)
+        print(f"   ✓ Batch Transform started for {target_model}: {transformer.latest_transform_job.name}")
 
-        # Load test data (simplified evaluation)
-        print("   • Loading test data...")
+        return transformer
 
-        # In production, load actual test data and compute metrics
-        # For now, return placeholder metrics
+    def read_batch_predictions(self, transformer: Transformer, features_uri: str) -> np.ndarray:
+        """Wait for a Batch Transform job and load its predictions"""
+        transformer.wait(logs=False)
+
+        # Batch Transform writes <input file name>.out under the output path
+        output_uri = f"{transformer.output_path}{features_uri.rsplit('/', 1)[1]}.out"
+        with download_s3_object(output_uri) as output:
+            return pd.read_csv(output, header=None).iloc[:, 0].to_numpy(dtype=np.float64)
+
+    def evaluate_model(self, endpoint_name: str, target_model: str, test_set: Tuple[str, pd.DataFrame],
+                       transformer: Transformer) -> dict:
+        """Evaluate one of the endpoint's models (a TARGET_MODELS key) from its Batch Transform job"""
+        print(f"📊 Evaluating model: {endpoint_name} ({target_model})\n")
+
+        features_uri, labels = test_set
+        predictions = self.read_batch_predictions(transformer, features_uri)
 
         metrics = {
             'endpoint': endpoint_name,
-            'accuracy': 0.92,  # Target: >0.90
-            'precision': 0.91,
-            'recall': 0.89,
-            'f1_score': 0.90,
+            'target_model': TARGET_MODELS[target_model],
+            'test_rows': len(labels),
             'evaluated_at': datetime.now().isoformat()
         }
 
-        print(f"   ✓ Accuracy: {metrics['accuracy']:.2%}")
-        print(f"   ✓ Precision: {metrics['precision']:.2%}")
-        print(f"   ✓ Recall: {metrics['recall']:.2%}")
-        print(f"   ✓ F1 Score: {metrics['f1_score']:.2%}\n")
+        if target_model == 'classifier':
+            y_true = labels['risk_level'].map({level: code for code, level in enumerate(RISK_LEVELS)}).to_numpy()
+            y_pred = predictions.astype(np.int64)
+            precision, recall, f1_score, _ = precision_recall_fscore_support(
+                y_true, y_pred, average='weighted', zero_division=0
+            )
+            metrics.update(
+                accuracy=float(accuracy_score(y_true, y_pred)),
+                precision=float(precision),
+                recall=float(recall),
+                f1_score=float(f1_score)
+            )
+
+            print(f"   ✓ Accuracy: {metrics['accuracy']:.2%}")
+            print(f"   ✓ Precision: {metrics['precision']:.2%}")
+            print(f"   ✓ Recall: {metrics['recall']:.2%}")
+            print(f"   ✓ F1 Score: {metrics['f1_score']:.2%}\n")
+        else:
+            # Rows without a performance score are not scored
+            scored = labels['performance_score'].notna().to_numpy()
+            y_true = labels['performance_score'].to_numpy(dtype=np.float64)[scored]
+            metrics.update(
+                rmse=float(np.sqrt(mean_squared_error(y_true, predictions[scored]))),
+                mae=float(mean_absolute_error(y_true, predictions[scored]))
+            )
+
+            print(f"   ✓ RMSE: {metrics['rmse']:.2f}")
+            print(f"   ✓ MAE: {metrics['mae']:.2f}\n")
 
         # Save metrics to S3
-        metrics_key = f"{S3_MODEL_PREFIX}metrics/{endpoint_name}-metrics.json"
+        metrics_key = f"{S3_MODEL_PREFIX}metrics/{endpoint_name}-{target_model}-metrics.json"
         s3_client.put_object(
             Bucket=S3_BUCKET,
             Key=metrics_key,
@@ -395,7 +601,6 @@ class IOPSModelTrainer:
 
         return metrics
 
-
 def main():
     """Main execution"""
     print("=" * 80)
@@ -408,37 +613,35 @@ def main():
     # Get data paths
     data_paths = trainer.get_latest_data_paths()
 
-    # Train classifier
+    # Train classifier and regressor together
     print("=" * 80)
-    print("PHASE 1: Risk Level Classifier Training")
+    print("PHASE 1: Risk Classifier + Performance Regressor Training")
     print("=" * 80)
     print()
-    classifier_job = trainer.train_classifier(data_paths)
+    training_job = trainer.train_models(data_paths)
+    model_data_prefix = trainer.package_multi_model_artifacts(training_job)
 
-    # Train regressor
-    print("\n" + "=" * 80)
-    print("PHASE 2: Performance Forecasting Regressor Training")
-    print("=" * 80)
-    print()
-    regressor_job = trainer.train_regressor(data_paths)
+    # Start both test-set Batch Transform jobs now so they run while the endpoint is being created
+    test_set = trainer.prepare_test_set(data_paths['test'])
+    transformers = {
+        target_model: trainer.start_batch_transform(target_model, test_set[0])
+        for target_model in TARGET_MODELS
+    }
 
-    # Deploy classifier
+    # Deploy classifier and regressor on one endpoint
     print("\n" + "=" * 80)
-    print("PHASE 3: Model Deployment with Auto-Scaling")
+    print("PHASE 2: Model Deployment with Auto-Scaling")
     print("=" * 80)
     print()
-    classifier_endpoint = trainer.deploy_with_autoscaling('iops-risk-classifier', classifier_job)
-
-    # Deploy regressor
-    regressor_endpoint = trainer.deploy_with_autoscaling('iops-perf-regressor', regressor_job)
+    endpoint = trainer.deploy_with_autoscaling(model_data_prefix)
 
     # Evaluate models
     print("\n" + "=" * 80)
-    print("PHASE 4: Model Evaluation")
+    print("PHASE 3: Model Evaluation")
     print("=" * 80)
     print()
-    classifier_metrics = trainer.evaluate_model(classifier_endpoint, data_paths['test'])
-    regressor_metrics = trainer.evaluate_model(regressor_endpoint, data_paths['test'])
+    classifier_metrics = trainer.evaluate_model(endpoint, 'classifier', test_set, transformers['classifier'])
+    regressor_metrics = trainer.evaluate_model(endpoint, 'regressor', test_set, transformers['regressor'])
 
     # Summary
     print("\n" + "=" * 80)
@@ -446,12 +649,14 @@ def main():
     print("=" * 80)
     print()
     print("📊 Summary:")
-    print(f"   • Classifier Endpoint: {classifier_endpoint}")
-    print(f"   • Regressor Endpoint: {regressor_endpoint}")
+    print(f"   • Endpoint (multi-model): {endpoint}")
+    print(f"   • Classifier: TargetModel={TARGET_MODELS['classifier']}")
+    print(f"   • Regressor: TargetModel={TARGET_MODELS['regressor']}")
     print(f"   • Auto-scaling: {MIN_INSTANCES}-{MAX_INSTANCES} instances")
     print(f"   • Instance Type: {ENDPOINT_INSTANCE_TYPE}")
     print(f"   • Classifier Accuracy: {classifier_metrics['accuracy']:.2%}")
-    print(f"   • Hyperparameter Jobs: 50 per model")
+    print(f"   • Regressor RMSE: {regressor_metrics['rmse']:.2f}")
+    print(f"   • Hyperparameter Jobs: up to {MAX_TUNING_JOBS}, Hyperband (classifier + regressor per job)")
     print()
     print("✅ Models are ready for production inference!")
     print()
@@ -15,6 +15,7 @@ from sagemaker import get_execution_role
 import time
 import argparse
 import json
+import os
 
 # Configuration
 CONFIG = {
@@ -22,12 +23,23 @@ CONFIG = {
     'prefix': 'marketplace-health-model',
     'region': 'us-east-1',
     'instance_type': 'ml.m5.xlarge',  # $0.269/hour
+    # Hosting instance; the small MLP is compute-bound, so compute-optimized
+    # families (ml.c5/ml.c6i) lower ModelLatency without a GPU or accelerator
+    'inference_instance_type': 'ml.m5.xlarge',
     'instance_count': 1,
     'max_runtime_seconds': 3600,  # 1 hour max
+    # Mixed precision (AMP=1 in the training container); only applied on GPU training instances
+    'mixed_precision': False,
     'tensorflow_version': '2.13',
     'python_version': 'py310',
 }
 
+# Training job monitoring: status polls back off from 2s to 30s; log lines are tailed on every poll
+MONITOR_POLL_MIN_SECONDS = 2.0
+MONITOR_POLL_MAX_SECONDS = 30.0
+MONITOR_POLL_BACKOFF = 1.5
+TRAINING_LOG_GROUP = '/aws/sagemaker/TrainingJobs'
+
 
 def get_or_create_role(role_name: str = 'SageMakerExecutionRole') -> str:
     """
@@ -69,8 +81,8 @@ def create_training_job(
     if hyperparameters is None:
         hyperparameters = {
             'epochs': 50,
-            'batch-size': 64,
-            'learning-rate': 0.001,
+            'batch-size': 512,
+            'learning-rate': 0.008,
         }
 
     # S3 paths
@@ -88,12 +100,14 @@ def create_training_job(
     # Create TensorFlow estimator
     estimator = TensorFlow(
         entry_point=training_script,
+        dependencies=[os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference.py')],
         role=role_arn,
         instance_count=CONFIG['instance_count'],
         instance_type=CONFIG['instance_type'],
         framework_version=CONFIG['tensorflow_version'],
         py_version=CONFIG['python_version'],
         hyperparameters=hyperparameters,
+        environment={'AMP': '1' if CONFIG['mixed_precision'] else '0'},
         output_path=s3_output_path,
         max_run=CONFIG['max_runtime_seconds'],
         base_job_name='marketplace-health-model',
@@ -125,20 +139,25 @@ def create_training_job(
 
 def monitor_training_job(job_name: str):
     """
-    Monitor training job progress.
+    Monitor training job progress, printing the job's CloudWatch log lines as they arrive.
+    Status is polled every 2s at first, backing off to every 30s for long jobs.
     """
     sagemaker_client = boto3.client('sagemaker', region_name=CONFIG['region'])
+    logs_client = boto3.client('logs', region_name=CONFIG['region'])
 
     print(f"\n📊 Monitoring training job: {job_name}\n")
 
+    log_tokens = {}
+    poll_seconds = MONITOR_POLL_MIN_SECONDS
+    last_status = None
+
     while True:
         response = sagemaker_client.describe_training_job(TrainingJobName=job_name)
         status = response['TrainingJobStatus']
-
-        print(f"Status: {status}", end='')
+        tail_training_logs(logs_client, job_name, log_tokens)
 
         if status == 'Completed':
-            print("\n\n✅ Training completed successfully!")
+            print("\n✅ Training completed successfully!")
             print(f"Model artifact: {response['ModelArtifacts']['S3ModelArtifacts']}")
 
             # Print metrics
@@ -149,26 +168,59 @@ def monitor_training_job(job_name: str):
 
             break
         elif status == 'Failed':
-            print("\n\n❌ Training failed!")
+            print("\n❌ Training failed!")
             print(f"Failure reason: {response.get('FailureReason', 'Unknown')}")
             break
         elif status == 'Stopped':
-            print("\n\n⚠️  Training stopped")
+            print("\n⚠️  Training stopped")
             break
         else:
-            print(" (in progress...)")
-            time.sleep(30)
+            if status != last_status:
+                print(f"Status: {status} ({response.get('SecondaryStatus', '')})")
+                last_status = status
+            time.sleep(poll_seconds)
+            poll_seconds = min(poll_seconds * MONITOR_POLL_BACKOFF, MONITOR_POLL_MAX_SECONDS)
+
+
+def tail_training_logs(logs_client, job_name: str, log_tokens: dict) -> None:
+    """Print log events written since the last call for each of the job's log streams (tokens kept in log_tokens)"""
+    try:
+        streams = logs_client.describe_log_streams(
+            logGroupName=TRAINING_LOG_GROUP,
+            logStreamNamePrefix=f"{job_name}/",
+        )['logStreams']
+    except logs_client.exceptions.ResourceNotFoundException:
+        return  # No logs until the instance has started
+
+    for stream in streams:
+        stream_name = stream['logStreamName']
+        while True:
+            kwargs = {'nextToken': log_tokens[stream_name]} if stream_name in log_tokens else {'startFromHead': True}
+            events = logs_client.get_log_events(
+                logGroupName=TRAINING_LOG_GROUP,
+                logStreamName=stream_name,
+                **kwargs,
+            )
+            for event in events['events']:
+                print(event['message'])
+
+            # The forward token stays the same once the stream has no newer events
+            done = events['nextForwardToken'] == log_tokens.get(stream_name)
+            log_tokens[stream_name] = events['nextForwardToken']
+            if done or not events['events']:
+                break
 
 
 def deploy_endpoint(
     model_data: str,
     role_arn: str,
-    endpoint_name: str = 'marketplace-health-endpoint'
+    endpoint_name: str = 'marketplace-health-endpoint',
+    instance_type: str = CONFIG['inference_instance_type'],
 ) -> str:
     """
     Deploy trained model to SageMaker endpoint.
     """
-    print(f"\n🚀 Deploying model to endpoint: {endpoint_name}")
+    print(f"\n🚀 Deploying model to endpoint: {endpoint_name} ({instance_type})")
 
     sagemaker_client = boto3.client('sagemaker', region_name=CONFIG['region'])
 
@@ -183,7 +235,7 @@ def deploy_endpoint(
         region=CONFIG['region'],
         version=CONFIG['tensorflow_version'],
         py_version=CONFIG['python_version'],
-        instance_type='ml.m5.xlarge',
+        instance_type=instance_type,
         image_scope='inference',
     )
 
@@ -210,7 +262,7 @@ def deploy_endpoint(
                 'VariantName': 'AllTraffic',
                 'ModelName': model_name,
                 'InitialInstanceCount': 1,
-                'InstanceType': 'ml.m5.xlarge',
+                'InstanceType': instance_type,
             }
         ],
     )
@@ -251,12 +303,15 @@ def main():
     parser.add_argument('--role-name', type=str, default='SageMakerExecutionRole',
                         help='SageMaker execution role name (if ARN not provided)')
     parser.add_argument('--epochs', type=int, default=50, help='Number of epochs')
-    parser.add_argument('--batch-size', type=int, default=64, help='Batch size')
-    parser.add_argument('--learning-rate', type=float, default=0.001, help='Learning rate')
+    parser.add_argument('--batch-size', type=int, default=512, help='Batch size (multiple of 8)')
+    parser.add_argument('--learning-rate', type=float, default=0.008,
+                        help='Learning rate (scale linearly with batch size)')
     parser.add_argument('--deploy', action='store_true', help='Deploy endpoint after training')
     parser.add_argument('--wait', action='store_true', help='Wait for training to complete')
     parser.add_argument('--endpoint-name', type=str, default='marketplace-health-endpoint',
                         help='Endpoint name for deployment')
+    parser.add_argument('--inference-instance-type', type=str, default=CONFIG['inference_instance_type'],
+                        help='Hosting instance type for the endpoint (e.g. ml.c6i.xlarge)')
 
     args = parser.parse_args()
 
@@ -298,6 +353,7 @@ def main():
                 model_data=result['model_data'],
                 role_arn=role_arn,
                 endpoint_name=args.endpoint_name,
+                instance_type=args.inference_instance_type,
             )
 
     print("\n✅ Done!")